@@ -0,0 +1,435 @@
+import numpy as np
+import asyncio
+import ast
+import re
+import itertools
+import inspect
+from StockLib.utils import DATATYPE
+import StockLib.Streaming as stream
+
+# Indicators usable in the conditions: name -> streaming class
+INDICATORS = {
+    'EMA': stream.StreamingEMA,
+    'MACD': stream.StreamingMACD,
+    'RSI': stream.StreamingRSI,
+    'ATR': stream.StreamingATR,
+    'ADX': stream.StreamingADX,
+    'BollingerBands': stream.StreamingBollingerBands,
+    'DonchianChannels': stream.StreamingDonchianChannels,
+    'Stochastic': stream.StreamingStochastic,
+}
+
+_OPERAND = re.compile(r'^\s*(\w+)\s*(?:\(([^)]*)\))?\s*(?:\.\s*(.+?))?\s*$')
+
+def _operand(ref):
+    '''
+    Private canonical form of an operand: a number, an OHLCV field ('Close') or an indicator output ('RSI(14)', 'MACD(12,26,9).sig')
+
+    :returns: (canonical name or number, indicator spec or None, output key or None)
+    '''
+
+    if isinstance(ref, (int, float)) and not isinstance(ref, bool):
+        return float(ref), None, None
+
+    match = _OPERAND.match(str(ref))
+    if match == None:
+        raise ValueError(f'Invalid operand: {ref}')
+    name, args, key = match.groups()
+
+    if name.capitalize() in DATATYPE and args == None and key == None:
+        return name.capitalize(), None, None
+    if name not in INDICATORS:
+        raise ValueError(f'Unknown indicator: {name} (accepted: {", ".join(INDICATORS)})')
+
+    # Paramètres par défaut explicités : 'RSI' et 'RSI(14)' partagent le même indicateur
+    values = ast.literal_eval(f'({args},)') if args else ()
+    try:
+        bound = inspect.signature(INDICATORS[name]).bind(*values)
+    except TypeError:
+        raise ValueError(f'Invalid parameters for {name}: {args}')
+    bound.apply_defaults()
+    spec = f'{name}({",".join(repr(v) for v in bound.args)})'
+    return (spec if key == None else f'{spec}.{key}'), spec, key
+
+
+class Condition():
+    """
+    Condition evaluated on every new bar. Build it with *above*, *below*, *crosses_above*, *crosses_below* or *band_break*.
+    """
+
+    def __init__(self, kind: str, a, b):
+        '''
+        Constructor
+
+        :param kind: 'above', 'below', 'crosses_above', 'crosses_below' or 'band_break'
+        :param a: Operand
+        :param b: Operand (number, field or indicator output), indicator with 'Upper band' / 'Lower band' outputs for 'band_break'
+        '''
+
+        self.kind: str = kind
+        self.a, spec_a, key_a = _operand(a)
+        if isinstance(self.a, float):
+            raise ValueError('The first operand of a condition can not be a number')
+
+        if kind == 'band_break':
+            _, spec, key = _operand(b)
+            if spec == None or key != None:
+                raise ValueError(f'Band indicator expected: {b}')
+            self.b = spec
+            self.operands = [self.a, f'{spec}.Upper band', f'{spec}.Lower band']
+            self.specs = {s for s in [spec_a, spec] if s != None}
+        else:
+            self.b, spec_b, key_b = _operand(b)
+            self.operands = [op for op in [self.a, self.b] if not isinstance(op, float)]
+            self.specs = {s for s in [spec_a, spec_b] if s != None}
+
+    @property
+    def level(self):
+        '''
+        True if the condition compares an operand with a constant level (evaluated in the sorted level groups)
+        '''
+
+        return isinstance(self.b, float)
+
+    def __repr__(self):
+        return f'{self.kind}({self.a}, {self.b})'
+
+
+def above(a, b):
+    '''
+    Fires on every bar where ``a > b``
+    '''
+    return Condition('above', a, b)
+
+def below(a, b):
+    '''
+    Fires on every bar where ``a < b``
+    '''
+    return Condition('below', a, b)
+
+def crosses_above(a, b):
+    '''
+    Fires on the bar where ``a`` goes over ``b`` (previous ``a <= b``, now ``a > b``)
+    '''
+    return Condition('crosses_above', a, b)
+
+def crosses_below(a, b):
+    '''
+    Fires on the bar where ``a`` goes under ``b`` (previous ``a >= b``, now ``a < b``)
+    '''
+    return Condition('crosses_below', a, b)
+
+def band_break(band, a = 'Close'):
+    '''
+    Fires on the bar where ``a`` goes out of a band indicator, e.g. ``band_break('BollingerBands(20,2)')``
+    '''
+    return Condition('band_break', a, band)
+
+
+class Alert():
+    """
+    Subscription of a callback to a condition on a ticker
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, ticker: str, condition: Condition, callback = None, once: bool = False, name: str = None):
+
+        self.id: int = next(Alert._ids)
+        self.ticker: str = ticker
+        self.condition: Condition = condition
+        self.callback = callback
+        self.once: bool = once
+        self.name: str = name if name != None else f'{ticker} {condition}'
+        self.active: bool = True
+        self.count: int = 0
+
+    def __repr__(self):
+        return f'Alert({self.id}, {self.name})'
+
+
+class AlertEvent():
+    """
+    Alert fired on a bar
+    """
+
+    def __init__(self, alert: Alert, time, value: float, level: float, direction: str = None):
+
+        self.alert: Alert = alert
+        self.ticker: str = alert.ticker
+        self.time = time
+        self.value: float = value
+        self.level: float = level
+        self.direction: str = direction
+
+    def __repr__(self):
+        direction = f' {self.direction}' if self.direction != None else ''
+        return f'AlertEvent({self.alert.name}{direction} at {self.time}: {self.value:.6g} vs {self.level:.6g})'
+
+
+class _Watch():
+    """
+    Private state of a watched ticker: shared indicators, last operand values, alerts indexed by operand
+    """
+
+    def __init__(self, stock):
+
+        self.stock = stock
+        self.streams: dict = {}
+        self.last: dict = {}
+        self.levels: dict = {}
+        self.pairs: list = []
+        self._sorted: dict = {}
+
+
+class AlertEngine():
+    """
+    Alerts evaluated incrementally on the new bars of *Stock* / *Bundle* objects (*append_bars*).
+
+    Indicators are computed once per ticker and shared by all the alerts using them. Alerts comparing an operand with
+    a constant level are kept sorted per (ticker, operand, kind): a bar costs a binary search whatever their number.
+    A bar of a ticker only updates the indicators and the alerts of that ticker.
+    """
+
+    def __init__(self, on_error = None):
+        '''
+        Constructor
+
+        :param on_error: Function (event, exception) called when an alert callback raises. If ommited, the first exception
+            is raised again by *Stock.append_bars*, once every event of the bars was delivered
+        '''
+
+        self.on_error = on_error
+        self.alerts: dict = {}
+        self._watches: dict = {}
+        self._queues: list = []
+
+    def subscribe(self, target, condition: Condition, callback = None, once: bool = False, name: str = None, tickers: list[str] = None):
+        '''
+        Registers an alert
+
+        :param target: *Stock*, or *Bundle* (one alert per stock)
+        :param condition: *Condition*
+        :param callback: Function (event) called when the alert fires, events are also sent to the *events* queues
+        :param once: Removes the alert after its first event
+        :param name: Name of the alert
+        :param tickers: Stocks of the bundle concerned, all if ommited
+        :returns: *Alert*, or list of *Alert* for a bundle
+        '''
+
+        if hasattr(target, 'stocks'):
+            stocks = [target.stocks[ticker] for ticker in (tickers if tickers != None else target.stocks.keys())]
+            return [self.subscribe(stock, condition, callback, once, name) for stock in stocks]
+
+        watch = self.__watch__(target)
+        for spec in condition.specs:
+            self.__stream__(watch, spec)
+
+        alert = Alert(target.ticker, condition, callback, once, name)
+        self.alerts[alert.id] = alert
+        if condition.level:
+            watch.levels.setdefault((condition.a, condition.kind), []).append(alert)
+            watch._sorted.pop((condition.a, condition.kind), None)
+        else:
+            watch.pairs.append(alert)
+        return alert
+
+    def unsubscribe(self, alert: Alert):
+        '''
+        Removes an alert. Indicators no longer used by the alerts of the ticker are dropped.
+        '''
+
+        alert.active = False
+        if self.alerts.pop(alert.id, None) == None:
+            return
+        watch = self._watches[alert.ticker]
+        condition = alert.condition
+        if condition.level:
+            group = (condition.a, condition.kind)
+            watch.levels[group].remove(alert)
+            watch._sorted.pop(group, None)
+            if len(watch.levels[group]) == 0:
+                del watch.levels[group]
+        else:
+            watch.pairs.remove(alert)
+
+        used = set()
+        for a in self.alerts.values():
+            if a.ticker == alert.ticker:
+                used |= a.condition.specs
+        for spec in set(watch.streams) - used:
+            del watch.streams[spec]
+
+    def events(self, maxsize: int = 0):
+        '''
+        asyncio queue receiving the events, to be created in the running event loop.
+        Bars may be appended from another thread.
+
+        :returns: asyncio.Queue of *AlertEvent*
+        '''
+
+        queue = asyncio.Queue(maxsize)
+        self._queues.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def __watch__(self, stock):
+        '''
+        Watched state of a stock, registering the engine as a listener of its new bars
+        '''
+
+        if stock.ticker not in self._watches:
+            watch = _Watch(stock)
+            self._watches[stock.ticker] = watch
+            stock.add_listener(self.on_bars)
+            if not stock._yfdata.empty:
+                last = stock._yfdata.iloc[-1]
+                watch.last.update({field: float(last[field]) for field in DATATYPE if field in last.index})
+        return self._watches[stock.ticker]
+
+    def __stream__(self, watch: _Watch, spec: str):
+        '''
+        Shared streaming indicator of a ticker, warmed up on the loaded data
+        '''
+
+        if spec in watch.streams:
+            return watch.streams[spec]
+
+        name, args = spec.split('(', 1)
+        indicator = INDICATORS[name](*ast.literal_eval(f'({args[:-1]},)' if args[:-1] else '()'))
+        if not watch.stock._yfdata.empty:
+            indicator.update_many(watch.stock._yfdata)
+        watch.streams[spec] = indicator
+        watch.last.update(self.__values__(spec, indicator, indicator.value))
+        return indicator
+
+    def __values__(self, spec: str, indicator, value):
+        '''
+        Operand values of an indicator output: ``spec`` for its main output, ``spec.key`` for the others
+        '''
+
+        if isinstance(value, dict):
+            return {spec if key == indicator.name else f'{spec}.{key}': float(v) for key, v in value.items()}
+        return {spec: float(value)}
+
+    def on_bars(self, stock, index, bars):
+        '''
+        Listener of *Stock.append_bars*: updates the indicators of the ticker and fires its alerts
+
+        :param stock: *Stock* receiving the bars
+        :param index: Timestamp of the bar, or index of the bars
+        :param bars: Dictionnary of a bar, or OHLCV dataframe
+        :returns: List of the fired *AlertEvent*
+        '''
+
+        watch = self._watches.get(stock.ticker)
+        if watch == None or watch.stock is not stock:
+            return []
+
+        if isinstance(bars, dict):
+            rows = {field: np.array([bars[field]], dtype=float) for field in DATATYPE if field in bars}
+            for spec, indicator in watch.streams.items():
+                for operand, value in self.__values__(spec, indicator, indicator.update(bars)).items():
+                    rows[operand] = np.array([value])
+            times = [index]
+        else:
+            rows = {field: bars[field].to_numpy(dtype=float) for field in DATATYPE if field in bars.columns}
+            for spec, indicator in watch.streams.items():
+                values = indicator.update_chunk(bars)
+                for key in values.columns:
+                    rows[spec if key == indicator.name else f'{spec}.{key}'] = values[key].to_numpy(dtype=float)
+            times = list(index)
+
+        events = []
+        for i, time in enumerate(times):
+            now = {operand: arr[i] for operand, arr in rows.items()}
+            events += self.__evaluate__(watch, now, time)
+            watch.last.update(now)
+
+        # Une callback en erreur ne prive pas les autres alertes de leurs évènements
+        errors = [error for error in map(self.__emit__, events) if error != None]
+        if len(errors) > 0:
+            raise errors[0]
+        return events
+
+    def __evaluate__(self, watch: _Watch, now: dict, time):
+        '''
+        Alerts of a ticker fired by a bar
+        '''
+
+        events = []
+        last = watch.last
+
+        for (operand, kind), alerts in watch.levels.items():
+            if (operand, kind) not in watch._sorted:
+                order = sorted(alerts, key=lambda alert: alert.condition.b)
+                watch._sorted[(operand, kind)] = (np.array([alert.condition.b for alert in order]), order)
+            levels, order = watch._sorted[(operand, kind)]
+
+            x, x0 = now.get(operand, np.nan), last.get(operand, np.nan)
+            if x != x:
+                continue
+            match kind:
+                case 'above':
+                    fired = order[:levels.searchsorted(x, 'left')]
+                case 'below':
+                    fired = order[levels.searchsorted(x, 'right'):]
+                case 'crosses_above':
+                    fired = order[levels.searchsorted(x0, 'left'):levels.searchsorted(x, 'left')] if x0 == x0 else []
+                case 'crosses_below':
+                    fired = order[levels.searchsorted(x, 'right'):levels.searchsorted(x0, 'right')] if x0 == x0 else []
+            events += [AlertEvent(alert, time, x, alert.condition.b) for alert in fired]
+
+        for alert in watch.pairs:
+            condition = alert.condition
+            x, x0 = now.get(condition.a, np.nan), last.get(condition.a, np.nan)
+            if condition.kind == 'band_break':
+                upper, lower = condition.operands[1:]
+                if x > now.get(upper, np.nan) and x0 <= last.get(upper, np.nan):
+                    events.append(AlertEvent(alert, time, x, now[upper], 'up'))
+                elif x < now.get(lower, np.nan) and x0 >= last.get(lower, np.nan):
+                    events.append(AlertEvent(alert, time, x, now[lower], 'down'))
+                continue
+
+            y, y0 = now.get(condition.b, np.nan), last.get(condition.b, np.nan)
+            match condition.kind:
+                case 'above':
+                    fired = x > y
+                case 'below':
+                    fired = x < y
+                case 'crosses_above':
+                    fired = x > y and x0 <= y0
+                case 'crosses_below':
+                    fired = x < y and x0 >= y0
+            if fired:
+                events.append(AlertEvent(alert, time, x, y))
+
+        return events
+
+    def __emit__(self, event: AlertEvent):
+        '''
+        Sends an event to the callback of its alert and to the asyncio queues
+
+        :returns: Exception raised by the callback and not handled by ``on_error``, None otherwise
+        '''
+
+        alert = event.alert
+        if not alert.active:
+            return None
+        alert.count += 1
+        if alert.once:
+            self.unsubscribe(alert)
+
+        error = None
+        if alert.callback != None:
+            try:
+                alert.callback(event)
+            except Exception as e:
+                if self.on_error == None:
+                    error = e
+                else:
+                    self.on_error(event, e)
+
+        for loop, queue in self._queues:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        return error
@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import StockLib.Indicators as ind
+import StockLib.Sweep as sw
+
+STATS = ['Total return', 'Annual return', 'Annual volatility', 'Sharpe', 'Max drawdown', 'Trades']
+
+class _Frame():
+    """
+    Private light stand-in of a *Stock* (ticker and OHLCV data), sent to the sweep workers
+    """
+
+    def __init__(self, ticker: str, df: pd.DataFrame):
+        self.ticker = ticker
+        self._yfdata = df
+        self._arbo = {'loaded': True}
+
+
+def signals_to_position(entries: pd.Series, exits: pd.Series, side: float = 1.):
+    '''
+    Position held between entry and exit signals
+
+    :param entries: Boolean serie, True where a position is opened
+    :param exits: Boolean serie, True where the position is closed
+    :param side: 1 for long positions, -1 for short positions
+    :returns: Position serie
+    '''
+
+    state = pd.Series(np.nan, index=entries.index)
+    state[exits.fillna(False).astype(bool)] = 0.
+    state[entries.fillna(False).astype(bool)] = side
+    return state.ffill().fillna(0.)
+
+
+def rsi_rule(stock, n: int = 14, low: float = 30, high: float = 70):
+    '''
+    Long when the RSI goes under ``low``, flat when it goes over ``high``
+    '''
+
+    rsi = ind.RSI(stock, n).get_rawdata()['indicator']['RSI']
+    return signals_to_position(rsi < low, rsi > high)
+
+
+def macd_rule(stock, a: int = 12, b: int = 26, c: int = 9):
+    '''
+    Long while the MACD is above its signal
+    '''
+
+    macd = ind.MACD(stock, a=a, b=b, c=c).get_rawdata()['indicator']
+    return (macd['MACD'] > macd['sig']).astype(float)
+
+
+def bollinger_rule(stock, n: int = 20, k: float = 2):
+    '''
+    Long when the close goes under the lower band, flat when it goes back over the rolling mean
+    '''
+
+    bands = ind.BollingerBands(stock, n, k).get_rawdata()['onstock']
+    close = stock._yfdata['Close']
+    return signals_to_position(close < bands['Lower band'], close > bands['Rolling mean'])
+
+
+def _positions(entries: np.ndarray, exits: np.ndarray, side: float = 1.):
+    '''
+    Private *signals_to_position* over boolean arrays (time x column)
+    '''
+
+    state = np.where(entries, side, np.where(exits, 0., np.nan))
+    last = np.where(state == state, np.arange(len(state))[:, None], 0)
+    np.maximum.accumulate(last, axis=0, out=last)
+    return np.nan_to_num(np.take_along_axis(state, last, axis=0))
+
+def _stack(stocks: dict, index: pd.Index, fun):
+    '''
+    Private (parameter x time x ticker) array of a function computing a (time x parameter) array on the data of every stock,
+    aligned on ``index``
+    '''
+
+    out = None
+    for col, stock in enumerate(stocks.values()):
+        values = fun(stock._yfdata)
+        if out is None:
+            out = np.full((values.shape[1], len(stocks), len(index)), np.nan)
+        out[:, col, index.get_indexer(stock._yfdata.index)] = values.T
+    return out.transpose(0, 2, 1)
+
+def rsi_batch(stocks: dict, index: pd.Index, combinations: list[dict]):
+    '''
+    Positions of *rsi_rule* for a list of parameter combinations.
+    The RSI of every distinct period is computed in one pass per stock (*Sweep.rsi_sweep*), each combination only applies its thresholds.
+
+    :param stocks: Dictionnary ticker -> *Stock*
+    :param index: Time index of the positions
+    :param combinations: Parameters of the rule
+    :returns: Generator of position arrays (time x ticker), in the order of the combinations
+    '''
+
+    params = [{'n': 14, 'low': 30, 'high': 70, **p} for p in combinations]
+    windows = sorted({p['n'] for p in params})
+    rsi = _stack(stocks, index, lambda df: sw.rsi_sweep(df['Close'], windows))
+    for p in params:
+        values = rsi[windows.index(p['n'])]
+        with np.errstate(invalid='ignore'):
+            yield _positions(values < p['low'], values > p['high'])
+
+def bollinger_batch(stocks: dict, index: pd.Index, combinations: list[dict]):
+    '''
+    Positions of *bollinger_rule* for a list of parameter combinations.
+    The bands of every distinct period are computed in one pass per stock and multiplier (*Sweep.bollinger_sweep*).
+
+    :param stocks: Dictionnary ticker -> *Stock*
+    :param index: Time index of the positions
+    :param combinations: Parameters of the rule
+    :returns: Generator of position arrays (time x ticker), in the order of the combinations
+    '''
+
+    params = [{'n': 20, 'k': 2, **p} for p in combinations]
+    close = _stack(stocks, index, lambda df: np.asarray(df[['Close']], dtype=float))[0]
+    bands = {}
+    for k in {p['k'] for p in params}:
+        windows = sorted({p['n'] for p in params if p['k'] == k})
+        def fun(df, windows=windows, k=k):
+            values = sw.bollinger_sweep(df['Close'], windows, k)
+            return np.hstack([values['Lower band'], values['Rolling mean']])
+        values = _stack(stocks, index, fun)
+        bands.update({(n, k): (values[i], values[len(windows) + i]) for i, n in enumerate(windows)})
+    for p in params:
+        lower, mean = bands[(p['n'], p['k'])]
+        with np.errstate(invalid='ignore'):
+            yield _positions(close < lower, close > mean)
+
+# Formes groupées des règles, utilisées par Backtest.sweep
+BATCHES = {rsi_rule: rsi_batch, bollinger_rule: bollinger_batch}
+
+
+class Backtest():
+    """
+    Vectorized backtest of position rules over a *Stock* or a *Bundle*
+    """
+
+    def __init__(self, data, cost: float = 0., slippage: float = 0., periods: int = 252):
+        '''
+        Constructor
+
+        :param data: *Stock*, *Bundle* or dictionnary ticker -> *Stock*
+        :param cost: Transaction cost, fraction of the traded value
+        :param slippage: Slippage, fraction of the traded value
+        :param periods: Number of bars per year (annualization)
+        '''
+
+        if isinstance(data, dict):
+            stocks = data
+        elif hasattr(data, 'stocks'):
+            stocks = data.stocks
+        else:
+            stocks = {data.ticker: data}
+        self.stocks: dict = {ticker: stock for ticker, stock in stocks.items() if stock._arbo['loaded']}
+
+        self.cost: float = cost
+        self.slippage: float = slippage
+        self.periods: int = periods
+
+        self.close = pd.DataFrame({ticker: stock._yfdata['Close'] for ticker, stock in self.stocks.items()})
+        # Rendements et equity accumulés en float64, même pour des prix float32
+        self._returns = self.close.astype(np.float64).pct_change().fillna(0.).to_numpy()
+        self._cache: dict = {}
+
+    def positions(self, rule, **params):
+        '''
+        Position matrix (time x ticker) of a rule. Results are cached per rule and parameters.
+
+        :param rule: Function (stock, **params) -> position serie (1 long, -1 short, 0 flat)
+        :param params: Parameters of the rule
+        :returns: Dataframe
+        '''
+
+        key = (rule, tuple(sorted(params.items())))
+        if key not in self._cache:
+            self._cache[key] = pd.DataFrame(
+                {ticker: rule(stock, **params) for ticker, stock in self.stocks.items()},
+                index=self.close.index
+                ).fillna(0.)
+        return self._cache[key]
+
+    def run(self, rule, **params):
+        '''
+        Backtests a rule on every stock at once
+
+        :param rule: Function (stock, **params) -> position serie
+        :param params: Parameters of the rule
+        :returns: Dictionnary with positions, strategy returns, equity curves and stats dataframes
+        '''
+
+        pos = self.positions(rule, **params)
+        returns, equity, stats = self.__evaluate__(pos.to_numpy())
+
+        return {
+            'positions': pos,
+            'returns': pd.DataFrame(returns, index=self.close.index, columns=self.close.columns),
+            'equity': pd.DataFrame(equity, index=self.close.index, columns=self.close.columns),
+            'stats': pd.DataFrame(stats, index=STATS, columns=self.close.columns).T
+        }
+
+    def __evaluate__(self, pos: np.ndarray):
+        '''
+        Strategy returns, equity curves and stats of a position matrix (one NumPy pass over time x ticker)
+        '''
+
+        held = np.vstack([np.zeros((1, pos.shape[1])), pos[:-1]])
+        turnover = np.abs(np.diff(pos, axis=0, prepend=0.))
+        returns = held * self._returns - turnover * (self.cost + self.slippage)
+        equity = np.cumprod(1 + returns, axis=0)
+
+        nbars = max(len(returns), 1)
+        total = equity[-1] - 1 if len(equity) > 0 else np.zeros(pos.shape[1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annual = (1 + total) ** (self.periods / nbars) - 1
+            vol = returns.std(axis=0) * np.sqrt(self.periods)
+            sharpe = returns.mean(axis=0) * self.periods / vol
+            drawdown = (equity / np.maximum.accumulate(equity, axis=0) - 1).min(axis=0, initial=0.)
+        trades = (turnover > 0).sum(axis=0)
+
+        return returns, equity, np.vstack([total, annual, vol, sharpe, drawdown, trades])
+
+    def __sweep__(self, rule, combinations: list[dict]):
+        '''
+        Stats of every combination of parameters. Rules with a batched form (see *BATCHES*) compute their indicators
+        once for all the combinations, the others are run combination after combination.
+        '''
+
+        if rule not in BATCHES or len(self.stocks) == 0:
+            return [self.__evaluate__(self.positions(rule, **params).to_numpy())[2] for params in combinations]
+
+        # Hors de l'historique d'une action la position est nulle, comme dans positions()
+        present = np.column_stack([self.close.index.isin(stock._yfdata.index) for stock in self.stocks.values()])
+        return [self.__evaluate__(np.where(present, pos, 0.))[2] for pos in BATCHES[rule](self.stocks, self.close.index, combinations)]
+
+    def sweep(self, rule, grid: dict, processes: int = None):
+        '''
+        Backtests every combination of a parameters grid. For *rsi_rule* and *bollinger_rule* the indicators of all the
+        periods of the grid are computed in one pass (see *BATCHES*).
+
+        :param rule: Module level function (stock, **params) -> position serie
+        :param grid: Dictionnary parameter -> list of values, e.g. ``{'n': range(5, 51)}``
+        :param processes: Number of worker processes, run in this process if ommited
+        :returns: Dataframe of the stats, indexed by parameters and ticker
+        '''
+
+        keys = list(grid.keys())
+        combinations = [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+        if processes == None:
+            results = self.__sweep__(rule, combinations)
+        else:
+            frames = {ticker: stock._yfdata for ticker, stock in self.stocks.items()}
+            settings = (self.cost, self.slippage, self.periods)
+            # Combinaisons consécutives par worker : les indicateurs groupés restent partagés dans chaque part
+            size = -(-len(combinations) // processes)
+            chunks = [combinations[i:i+size] for i in range(0, len(combinations), size)]
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(frames, settings)) as pool:
+                results = [stats for chunk in pool.map(_sweep_worker, [(rule, chunk) for chunk in chunks]) for stats in chunk]
+
+        stats = []
+        for params, result in zip(combinations, results):
+            df = pd.DataFrame(result, index=STATS, columns=self.close.columns).T
+            for key in reversed(keys):
+                df.insert(0, key, params[key])
+            stats.append(df)
+        return pd.concat(stats).rename_axis('Ticker').set_index(keys, append=True).reorder_levels(keys + ['Ticker'])
+
+
+_worker: Backtest = None
+
+def _init_worker(frames: dict, settings: tuple):
+    '''
+    Builds the backtest of a sweep worker once, from the data sent by the parent process
+    '''
+
+    global _worker
+    _worker = Backtest({ticker: _Frame(ticker, df) for ticker, df in frames.items()}, *settings)
+
+def _sweep_worker(task: tuple):
+    rule, combinations = task
+    return _worker.__sweep__(rule, combinations)
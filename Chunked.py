@@ -0,0 +1,108 @@
+import pandas as pd
+import os
+from StockLib.Providers import DataProvider
+from StockLib.Streaming import StreamingIndicator
+from StockLib.utils import cast_data
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa, pq = None, None
+
+class ChunkWriter():
+    """
+    Writes dataframes chunk after chunk in a single CSV or Parquet file.
+    The file is written under a temporary name and only replaces ``filepath`` once closed.
+    """
+
+    def __init__(self, filepath: str, format: str = 'csv'):
+        '''
+        Constructor
+
+        :param filepath: Destination file
+        :param format: 'csv' or 'parquet' (needs pyarrow)
+        '''
+
+        if format not in ['csv', 'parquet']:
+            raise ValueError(f'Unknown format: {format}')
+        if format == 'parquet' and pq == None:
+            raise ImportError('pyarrow is required to write Parquet files')
+
+        self.filepath: str = filepath
+        self.format: str = format
+        self.rows: int = 0
+        self._tmp: str = filepath + '.tmp'
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        '''
+        Appends a chunk to the file
+        '''
+
+        if self.format == 'csv':
+            df.to_csv(self._tmp, mode='w' if self.rows == 0 else 'a', header=self.rows == 0)
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=True)
+            if self._writer == None:
+                self._writer = pq.ParquetWriter(self._tmp, table.schema)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        '''
+        Closes the file and moves it to its destination
+        '''
+
+        if self._writer != None:
+            self._writer.close()
+        if os.path.exists(self._tmp):
+            os.replace(self._tmp, self.filepath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type == None:
+            self.close()
+        elif self._writer != None:
+            self._writer.close()
+
+
+def run_chunked(provider: DataProvider,
+                ticker: str,
+                indicators: list[StreamingIndicator],
+                filepath: str,
+                start = None,
+                end = None,
+                chunksize: int = 1_000_000,
+                format: str = 'csv',
+                ohlcv: bool = False,
+                dtypes: dict = None):
+    '''
+    Computes indicators over the history of a ticker chunk after chunk, and streams the values to a file.
+    Only one chunk is in memory at once: the indicators carry their state from a chunk to the next one.
+
+    :param provider: Data source, read by chunks if it is 'chunks' capable
+    :param ticker: Ticker
+    :param indicators: Streaming indicators (*Streaming.StreamingIndicator*), left in their final state
+    :param filepath: Output file
+    :param start: Beginning of the data (included)
+    :param end: End of the data (excluded)
+    :param chunksize: Number of bars per chunk
+    :param format: 'csv' or 'parquet'
+    :param ohlcv: Writes the OHLCV data along the indicators
+    :param dtypes: Dtype policy of the written data and values (see *utils.DTYPES*), float64 if ommited
+    :returns: Number of bars processed
+    '''
+
+    with ChunkWriter(filepath, format) as writer:
+        for chunk in provider.iter_chunks(ticker, start, end, chunksize):
+            columns = [chunk if dtypes == None else cast_data(chunk, dtypes)] if ohlcv else []
+            for indicator in indicators:
+                values = indicator.update_chunk(chunk)
+                if dtypes != None:
+                    values = values.astype(dtypes['indicators'], copy=False)
+                columns.append(values.rename(columns=lambda key: key if key == indicator.name else f'{indicator.name} {key}'))
+            writer.write(pd.concat(columns, axis=1))
+    return writer.rows
@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+
+class CorrelationEngine():
+    """
+    Covariance and correlation of the returns of a *Bundle*, updated bar by bar
+    """
+
+    def __init__(self, tickers: list[str], window: int = 60, halflife: float = None, dtype = np.float64, dense: bool = None, max_dense: int = 1000):
+        '''
+        Constructor
+
+        :param tickers: Tickers of the universe
+        :param window: Number of bars kept (rolling window, or truncation of the exponential weights)
+        :param halflife: Half-life (bars) of the exponential weights, equal weights over ``window`` if ommited
+        :param dtype: float64 or float32 (halves the memory, for large universes)
+        :param dense: Maintains the full covariance matrix incrementally, True if the universe has less than ``max_dense`` tickers when ommited
+        :param max_dense: Universe size above which the dense matrix is not maintained by default
+        '''
+
+        if dense == None:
+            dense = len(tickers) <= max_dense
+
+        self.tickers: list[str] = list(tickers)
+        self.window: int = window
+        self.halflife: float = halflife
+        self.dtype = np.dtype(dtype)
+        self.dense: bool = dense
+
+        self.decay: float = 1. if halflife == None else 0.5 ** (1 / halflife)
+        self._pos: dict = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        N = len(self.tickers)
+        self._buffer = np.zeros((window, N), dtype=self.dtype)
+        self._head: int = 0
+        self.count: int = 0
+
+        # Sufficient statistics (dense mode): weight sum, weighted sum and weighted cross products
+        self._w: float = 0.
+        self._s = np.zeros(N, dtype=self.dtype) if dense else None
+        self._c = np.zeros((N, N), dtype=self.dtype) if dense else None
+
+    def __len__(self):
+        return min(self.count, self.window)
+
+    def update(self, returns):
+        '''
+        Adds a bar of returns. NaN returns (no bar for a ticker) count as 0.
+
+        :param returns: Array of the returns, in the order of ``tickers``, or dictionnary ticker -> return
+        '''
+
+        if isinstance(returns, dict):
+            x = np.zeros(len(self.tickers), dtype=self.dtype)
+            for ticker, r in returns.items():
+                x[self._pos[ticker]] = r
+        else:
+            x = np.asarray(returns, dtype=self.dtype)
+        x = np.nan_to_num(x)
+
+        old = self._buffer[self._head].copy()
+        full = self.count >= self.window
+        self._buffer[self._head] = x
+        self._head = (self._head + 1) % self.window
+        self.count += 1
+
+        if self.dense:
+            # The bar leaving the window had the weight decay**(window-1), decay**window once decayed:
+            # the statistics are truncated at ``window`` as the blocked computations
+            self._w = self.decay*self._w + 1
+            self._s *= self.decay
+            self._s += x
+            self._c *= self.decay
+            self._c += np.outer(x, x)
+            if full:
+                drop = self.decay ** self.window
+                self._w -= drop
+                self._s -= drop*old
+                self._c -= drop*np.outer(old, old)
+            # Periodic recomputation, the additions / subtractions drift otherwise
+            if self.count % self.window == 0:
+                self.__refresh__()
+
+    def extend(self, returns):
+        '''
+        Adds many bars of returns
+
+        :param returns: Array or dataframe (time x ticker)
+        '''
+
+        if isinstance(returns, pd.DataFrame):
+            returns = returns.reindex(columns=self.tickers)
+        returns = np.nan_to_num(np.asarray(returns, dtype=self.dtype))
+
+        for x in returns[-self.window:]:
+            self._buffer[self._head] = x
+            self._head = (self._head + 1) % self.window
+        self.count += len(returns)
+        if self.dense:
+            self.__refresh__()
+
+    def __refresh__(self):
+        '''
+        Recomputes the rolling sufficient statistics from the buffer
+        '''
+
+        X = self.__window__()
+        w = self.__weights__(len(X))
+        self._w = float(w.sum())
+        self._s = w @ X
+        self._c = (X * w[:, None]).T @ X
+
+    def __window__(self):
+        '''
+        Returns kept, oldest first
+        '''
+
+        n = len(self)
+        idx = (self._head - n + np.arange(n)) % self.window
+        return self._buffer[idx]
+
+    def __weights__(self, n: int):
+        return (self.decay ** np.arange(n)[::-1]).astype(self.dtype)
+
+    def __standardized__(self):
+        '''
+        Weighted, centered and normalized returns (time x ticker): the correlation is the product of two columns
+        '''
+
+        X = self.__window__()
+        w = self.__weights__(len(X))
+        w = w / w.sum()
+        Z = (X - w @ X) * np.sqrt(w)[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Z /= np.sqrt((Z*Z).sum(axis=0))
+        return np.nan_to_num(Z)
+
+    def cov(self, block: int = 512):
+        '''
+        Covariance matrix of the returns
+
+        :param block: Number of columns computed at once when the dense statistics are not maintained
+        :returns: Dataframe (ticker x ticker)
+        '''
+
+        if self.dense:
+            mean = self._s / self._w
+            cov = self._c / self._w - np.outer(mean, mean)
+        else:
+            X = self.__window__()
+            w = self.__weights__(len(X))
+            w = w / w.sum()
+            Xc = (X - w @ X) * np.sqrt(w)[:, None]
+            cov = np.empty((Xc.shape[1], Xc.shape[1]), dtype=self.dtype)
+            for b in range(0, Xc.shape[1], block):
+                cov[b:b+block] = Xc[:, b:b+block].T @ Xc
+        return pd.DataFrame(cov, index=self.tickers, columns=self.tickers)
+
+    def corr(self, block: int = 512):
+        '''
+        Correlation matrix of the returns
+
+        :param block: Number of columns computed at once when the dense statistics are not maintained
+        :returns: Dataframe (ticker x ticker)
+        '''
+
+        cov = self.cov(block).to_numpy()
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.clip(cov / np.outer(std, std), -1, 1)
+        return pd.DataFrame(corr, index=self.tickers, columns=self.tickers)
+
+    def topk(self, ticker: str, k: int = 10):
+        '''
+        Tickers most correlated with a ticker, without computing the whole matrix (O(tickers x window))
+
+        :param ticker: Reference ticker
+        :param k: Number of tickers returned
+        :returns: Serie ticker -> correlation, sorted
+        '''
+
+        i = self._pos[ticker]
+        if self.dense:
+            mean = self._s / self._w
+            cov = self._c[i] / self._w - mean[i]*mean
+            var = np.diag(self._c) / self._w - mean*mean
+            with np.errstate(divide='ignore', invalid='ignore'):
+                corr = np.nan_to_num(cov / np.sqrt(var[i]*var))
+        else:
+            Z = self.__standardized__()
+            corr = Z.T @ Z[:, i]
+        return self.__select__(corr, i, k)
+
+    def topk_all(self, k: int = 10, block: int = 256):
+        '''
+        Most correlated tickers of every ticker, computed by blocks of rows: memory is bounded by ``block`` x tickers
+
+        :param k: Number of tickers per ticker
+        :param block: Number of tickers processed at once
+        :returns: Dictionnary ticker -> serie ticker -> correlation
+        '''
+
+        Z = self.__standardized__()
+        res = {}
+        for b in range(0, Z.shape[1], block):
+            rows = Z[:, b:b+block].T @ Z
+            for j, corr in enumerate(rows):
+                res[self.tickers[b+j]] = self.__select__(corr, b+j, k)
+        return res
+
+    def __select__(self, corr: np.ndarray, i: int, k: int):
+        corr = corr.astype(float)
+        corr[i] = -np.inf
+        k = max(min(k, len(corr) - 1), 0)
+        idx = np.argpartition(-corr, k)[:k]
+        idx = idx[np.argsort(-corr[idx])]
+        return pd.Series(np.clip(corr[idx], -1, 1), index=[self.tickers[j] for j in idx], name=self.tickers[i])
@@ -1,16 +1,20 @@
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
+import StockLib.Rolling as rol
 
 class _Indicator():
     """
     Private Class storing indicator data
     """
 
-    def __init__(self, stock, serie:pd.DataFrame = pd.DataFrame()):
+    def __init__(self, stock, serie:pd.DataFrame = pd.DataFrame(), tail:int = None, since = None):
         '''
         Constructor
 
         :param stock: *Stock* object to apply the indicator
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
 
         '''
 
@@ -28,7 +32,35 @@ class _Indicator():
             stock._yfdata
         except:
             raise AssertionError(f'Stock {stock} does not exist')
-        
+
+        # Requested bars: always the end of the history
+        self.index:pd.DatetimeIndex = stock._yfdata.index
+        if since != None:
+            since = pd.Timestamp(since)
+            if self.index.tz != None and since.tz == None:
+                since = since.tz_localize(self.index.tz)
+            self.index = self.index[self.index.searchsorted(since):]
+        if tail != None:
+            self.index = self.index[len(self.index) - min(tail, len(self.index)):]
+
+    def __window__(self, warmup:int, df:pd.DataFrame = None):
+        '''
+        Input data of the indicator: the requested bars and the ``warmup`` bars before them
+
+        :param warmup: Number of bars needed before the first requested bar
+        :param df: Data to slice, OHLCV data of the stock if ommited
+        '''
+
+        if df is None:
+            df = self.stock._yfdata
+        window = df.iloc[max(len(df) - len(self.index) - warmup, 0):]
+
+        # Calculs en float64 quel que soit le type de stockage
+        dtypes = window.dtypes if isinstance(window, pd.DataFrame) else pd.Series([window.dtype])
+        if (dtypes == np.float32).any():
+            window = window.astype(np.float64)
+        return window
+
     def __setdata__(self, name:str, data:pd.DataFrame, style:str, color:str = None):
         """
         Stores the data and its display style correctly in the attribute ```data``` of an ```_Indicator``` object
@@ -39,6 +71,10 @@ class _Indicator():
 
         """
 
+        data = data.iloc[len(data) - len(self.index):]
+        dtype = getattr(self.stock, 'dtypes', {}).get('indicators')
+        if dtype != None:
+            data = data.astype(dtype, copy=False)
         data.Name = name
         if style not in ['line', 'upperband', 'lowerband', 'bar']:
             style = 'line'
@@ -51,8 +87,8 @@ class _Indicator():
     
     def get_rawdata(self):
 
-        dfindic = pd.DataFrame(index=self.stock._yfdata.index)
-        dfonstock = pd.DataFrame(index=self.stock._yfdata.index)
+        dfindic = pd.DataFrame(index=self.index)
+        dfonstock = pd.DataFrame(index=self.index)
 
         indic:dict = self.data['indicator']
         onstock:dict = self.data['onstock']
@@ -66,9 +102,88 @@ class _Indicator():
         return {'indicator':dfindic, 
                 'onstock':dfonstock}
 
+def _ewm(x, alpha:float, min_periods:int):
+    '''
+    Private exponential weighted mean: pandas for a serie, vectorized across the tickers for a wide dataframe
+    '''
+
+    if isinstance(x, pd.DataFrame) and x.shape[1] > len(x):
+        return rol.ewm_mean(x, alpha, min_periods)
+    return x.ewm(alpha=alpha, min_periods=min_periods).mean()
+
+def _ewm_warmup(alpha:float, tol:float):
+    '''
+    Private number of bars after which the weight of older bars in an EWM is below ``tol``
+    '''
+
+    return int(np.ceil(np.log(tol) / np.log(1 - alpha)))
+
+def macd(close, a:float = 12, b:float = 26, c:float = 9):
+    '''
+    MACD formula, on a serie (one stock) or a dataframe (time x ticker)
+
+    :returns: (MACD, signal)
+    '''
+
+    fast_ema = _ewm(close, 2/(a+1), a)
+    slow_ema = _ewm(close, 2/(b+1), b)
+    macd = fast_ema - slow_ema
+    signal = _ewm(macd, 2/(c+1), c)
+    return macd, signal
+
+def atr(high, low, close, n:int = 14):
+    '''
+    ATR formula, on series (one stock) or dataframes (time x ticker)
+
+    :returns: (TR, ATR)
+    '''
+
+    p_close = close.shift(1)
+    TR = np.maximum(np.maximum(high - low, abs(high - p_close)), abs(low - p_close))
+    ATR = _ewm(TR, 1/n, n)
+    return TR, ATR
+
+def bollinger(close, n:int = 20, k:float = 2):
+    '''
+    Bollinger Bands formula, on a serie (one stock) or a dataframe (time x ticker)
+
+    :returns: (upper band, lower band, rolling mean)
+    '''
+
+    rolling_mean, rolling_std = rol.rolling_mean_std(close, n)
+    return rolling_mean + (rolling_std * k), rolling_mean - (rolling_std * k), rolling_mean
+
+def rsi(close, n:int = 14):
+    '''
+    RSI formula, on a serie (one stock) or a dataframe (time x ticker)
+    '''
+
+    delta = close.diff()
+    avg_gain = _ewm(delta.where(delta > 0, 0), 1/n, n)
+    avg_loss = _ewm(-delta.where(delta < 0, 0), 1/n, n)
+
+    RS = avg_gain / avg_loss
+    return 100 - (100 / (1 + RS))
+
+def adx(high, low, close, n:int = 14):
+    '''
+    ADX formula, on series (one stock) or dataframes (time x ticker)
+    '''
+
+    ATR = atr(high, low, close, n)[1]
+    PDM = high - high.shift(1)
+    NDM = low.shift(1) - low
+    PDM = PDM.where((PDM > 0) & (PDM > NDM), 0)
+    NDM = NDM.where((NDM > 0) & (NDM > PDM), 0)
+    PDI = (_ewm(PDM, 1/(1+n), n) / ATR) * 100
+    NDI = (_ewm(NDM, 1/(1+n), n) / ATR) * 100
+    DX = abs(PDI - NDI) / (PDI + NDI) * 100
+    return _ewm(DX, 1/n, n)
+
+
 class MACD(_Indicator):
 
-    def __init__(self, stock, serie:pd.DataFrame = pd.DataFrame(),a:float = 12,b:float = 26,c:float = 9):
+    def __init__(self, stock, serie:pd.DataFrame = pd.DataFrame(),a:float = 12,b:float = 26,c:float = 9, tail:int = None, since = None, tol:float = 1e-6):
         '''
         Mean Averaged Convergence Divergence (Indicator)
 
@@ -77,143 +192,270 @@ class MACD(_Indicator):
         :param a: EMA Slow
         :param b: EMA Fast
         :param c: Signal
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
+        :param tol: Tolerance of the values computed on a truncated history (``tail`` / ``since``)
         :returns: Dataframe
         '''
 
         self.name = 'MACD'
 
-        super().__init__(stock)
+        super().__init__(stock, tail=tail, since=since)
 
         if serie.empty:
-            input:pd.DataFrame = self.stock._yfdata['Close']
+            input:pd.DataFrame = self.__window__(self.warmup(a, b, c, tol))['Close']
 
-        fast_ema = input.ewm(span=a, min_periods=a).mean()
-        slow_ema = input.ewm(span=b, min_periods=b).mean()
-        macd = fast_ema - slow_ema
-        signal = macd.ewm(span=c, min_periods=c).mean()
-        self.data['indicator']['MACD'] = self.__setdata__('MACD',macd,'line')
+        else:
+            input:pd.DataFrame = self.__window__(self.warmup(a, b, c, tol), serie)
+
+        macd_line, signal = macd(input, a, b, c)
+        self.data['indicator']['MACD'] = self.__setdata__('MACD',macd_line,'line')
         self.data['indicator']['sig'] = self.__setdata__(f'Signal (n={c})',signal,'line')
-        delta = signal - macd
+        delta = signal - macd_line
         self.data['indicator']['deltaMACD'] = self.__setdata__('dMACD',delta,'bar')
 
+    @staticmethod
+    def warmup(a:float = 12, b:float = 26, c:float = 9, tol:float = 1e-6):
+        '''
+        Number of bars needed before the first computed bar: slow EMA, then signal EMA
+        '''
+        return max(b, _ewm_warmup(2/(max(a, b)+1), tol)) + max(c, _ewm_warmup(2/(c+1), tol))
+
     
 class ATR(_Indicator):
 
-    def __init__(self, stock, n:int = 14,min:int=20,max:int=80):
+    def __init__(self, stock, n:int = 14,min:int=20,max:int=80, tail:int = None, since = None, tol:float = 1e-6):
         '''
         Average True Rate
         :param stock: *Stock* object to apply the indicator
         :param n: Period
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
+        :param tol: Tolerance of the values computed on a truncated history (``tail`` / ``since``)
         :returns: Dataframe
         '''
 
         self.name = "ATR"
 
-        super().__init__(stock)
+        super().__init__(stock, tail=tail, since=since)
 
-        self.input = pd.DataFrame(columns=['c_high','c_low','p_close'])
-        self.input['c_high'] = self.stock._yfdata['High']
-        self.input['c_low'] = self.stock._yfdata['Low']
-        self.input['p_close'] = self.stock._yfdata['Close'].shift(1)
-        
-        df = pd.DataFrame()
-        df["HL"] = self.input['c_high'] - self.input['c_low']
-        df["HPC"] = abs(self.input['c_high'] - self.input['p_close'])
-        df["HPL"] = abs(self.input['c_low'] - self.input['p_close'])
+        self.input:pd.DataFrame = self.__window__(self.warmup(n, tol))
 
-        TR = df.max(axis=1,skipna=False)
-        ATR = TR.ewm(alpha=1/n, min_periods=n).mean()
+        TR, ATR = atr(self.input['High'], self.input['Low'], self.input['Close'], n)
 
         self.data['indicator']['TR'] = self.__setdata__('TR',TR, 'line')
         self.data['indicator']['ATR'] = self.__setdata__('ATR',ATR, 'line')
 
+    @staticmethod
+    def warmup(n:int = 14, tol:float = 1e-6):
+        '''
+        Number of bars needed before the first computed bar: previous close, then EMA of the true range
+        '''
+        return max(n, _ewm_warmup(1/n, tol)) + 1
+
 
 class BollingerBands(_Indicator):
 
-    def __init__(self, stock, n:int = 20, k:float = 2):
+    def __init__(self, stock, n:int = 20, k:float = 2, tail:int = None, since = None):
         '''
         Bollinger Bands
 
         :param stock: *Stock* object to apply the indicator
         :param n: Period
         :param k: Multiplier
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
         :returns: Dataframe
         '''
 
         self.name = "BollingerBands"
 
-        super().__init__(stock)
-
-        self.input:pd.DataFrame = self.stock._yfdata['Close']
+        super().__init__(stock, tail=tail, since=since)
 
-        rolling_mean = self.input.rolling(window=n).mean()
-        rolling_std = self.input.rolling(window=n).std()
+        self.input:pd.DataFrame = self.__window__(self.warmup(n))['Close']
 
-        upper_band = rolling_mean + (rolling_std * k)
-        lower_band = rolling_mean - (rolling_std * k)
+        upper_band, lower_band, rolling_mean = bollinger(self.input, n, k)
 
         self.data['onstock']['Upper band'] = self.__setdata__('High lim.', upper_band, 'upperband')
         self.data['onstock']['Lower band'] = self.__setdata__('Low lim.',lower_band, 'lowerband')
         self.data['onstock']['Rolling mean'] = self.__setdata__(f'Rolling Mean (n={n})',rolling_mean, 'line','white')
         self.data['indicator']['Delta'] = self.__setdata__('Range',upper_band-lower_band, 'bar')
 
+    @staticmethod
+    def warmup(n:int = 20, k:float = 2, tol:float = 1e-6):
+        '''
+        Number of bars needed before the first computed bar (exact, rolling window)
+        '''
+        return n - 1
+
 
 class RSI(_Indicator):
     
-    def __init__(self, stock, n:int = 14):
+    def __init__(self, stock, n:int = 14, tail:int = None, since = None, tol:float = 1e-6):
         '''
         Relative Strength Index
 
         :param stock: *Stock* object to apply the indicator
         :param n: Period
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
+        :param tol: Tolerance of the values computed on a truncated history (``tail`` / ``since``)
         :returns: Dataframe
         '''
 
         self.name = "RSI"
 
-        super().__init__(stock)
+        super().__init__(stock, tail=tail, since=since)
 
-        self.input:pd.DataFrame = self.stock._yfdata['Close']
+        self.input:pd.DataFrame = self.__window__(self.warmup(n, tol))['Close']
 
-        delta = self.input.diff()
-        avg_gain = (delta.where(delta > 0, 0)).ewm(alpha=1/n, min_periods=n).mean()
-        avg_loss = (-delta.where(delta < 0, 0)).ewm(alpha=1/n, min_periods=n).mean()
-
-        RS = avg_gain / avg_loss
-        RSI = 100 - (100 / (1 + RS))
+        RSI = rsi(self.input, n)
 
         self.data['indicator']['RSI'] = self.__setdata__('RSI', RSI, 'line')
 
+    @staticmethod
+    def warmup(n:int = 14, tol:float = 1e-6):
+        '''
+        Number of bars needed before the first computed bar: price difference, then EMA of the gains and losses
+        '''
+        return max(n, _ewm_warmup(1/n, tol)) + 1
+
 
 class ADX(_Indicator):
 
-    def __init__(self, stock, n:int = 14):
+    def __init__(self, stock, n:int = 14, tail:int = None, since = None, tol:float = 1e-6):
         '''
         Average Directional Index
 
         :param stock: *Stock* object to apply the indicator
         :param n: Period
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
+        :param tol: Tolerance of the values computed on a truncated history (``tail`` / ``since``)
         :returns: Dataframe
         '''
 
-        self.name = "Bollinger Bands"
+        self.name = "ADX"
 
-        super().__init__(stock)
+        super().__init__(stock, tail=tail, since=since)
 
-        self.input:pd.DataFrame = self.stock._yfdata
-        H = self.input['High']
-        L = self.input['Low']
+        self.input:pd.DataFrame = self.__window__(self.warmup(n, tol))
 
-        df = pd.DataFrame()
-        df['ATR'] = ATR(stock,n).get_rawdata()['onstock']['ATR']
-        df['PDM'] = H - H.shift(1)
-        df['NDM'] = L.shift(1) - L
-        df['PDM'] = df['PDM'].where((df['PDM'] > 0) & (df['PDM'] > df['NDM']), 0)
-        df['NDM'] = df['NDM'].where((df['NDM'] > 0) & (df['NDM'] > df['PDM']), 0)
-        df['PDI'] = (df['PDM'].ewm(com=n, min_periods=n).mean() / df['ATR']) * 100
-        df['NDI'] = (df['NDM'].ewm(com=n, min_periods=n).mean() / df['ATR']) * 100
-        DX = abs(df['PDI'] - df['NDI']) / (df['PDI'] + df['NDI']) * 100
-        ADX = DX.ewm(alpha=1/n, min_periods=n).mean()
+        ADX = adx(self.input['High'], self.input['Low'], self.input['Close'], n)
 
-        #self.data['indicator']['DX'] = self.__setdata__(DX, go.Scatter)
         self.data['indicator']['ADX'] = self.__setdata__('ADX' , ADX, 'line')
+
+    @staticmethod
+    def warmup(n:int = 14, tol:float = 1e-6):
+        '''
+        Number of bars needed before the first computed bar: ATR and directional movements, then EMA of the DX
+        '''
+        return 2*max(n, _ewm_warmup(1/n, tol)) + max(n, _ewm_warmup(1/(n+1), tol)) + 1
+
+
+class DonchianChannels(_Indicator):
+
+    def __init__(self, stock, n:int = 20, tail:int = None, since = None):
+        '''
+        Donchian Channels
+
+        :param stock: *Stock* object to apply the indicator
+        :param n: Period
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
+        :returns: Dataframe
+        '''
+
+        self.name = "DonchianChannels"
+
+        super().__init__(stock, tail=tail, since=since)
+
+        self.input:pd.DataFrame = self.__window__(self.warmup(n))
+
+        upper_band = rol.rolling_max(self.input['High'], n)
+        lower_band = rol.rolling_min(self.input['Low'], n)
+
+        self.data['onstock']['Upper band'] = self.__setdata__(f'High (n={n})', upper_band, 'upperband')
+        self.data['onstock']['Lower band'] = self.__setdata__(f'Low (n={n})', lower_band, 'lowerband')
+        self.data['onstock']['Middle'] = self.__setdata__('Middle', (upper_band + lower_band) / 2, 'line', 'white')
+
+    @staticmethod
+    def warmup(n:int = 20, tol:float = 1e-6):
+        '''
+        Number of bars needed before the first computed bar (exact, rolling window)
+        '''
+        return n - 1
+
+
+class Stochastic(_Indicator):
+
+    def __init__(self, stock, n:int = 14, d:int = 3, tail:int = None, since = None):
+        '''
+        Stochastic Oscillator
+
+        :param stock: *Stock* object to apply the indicator
+        :param n: Period of %K
+        :param d: Period of %D (moving average of %K)
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
+        :returns: Dataframe
+        '''
+
+        self.name = "Stochastic"
+
+        super().__init__(stock, tail=tail, since=since)
+
+        self.input:pd.DataFrame = self.__window__(self.warmup(n, d))
+
+        highest = rol.rolling_max(self.input['High'], n)
+        lowest = rol.rolling_min(self.input['Low'], n)
+        K = 100 * (self.input['Close'] - lowest) / (highest - lowest)
+        D = rol.rolling_mean_std(K, d)[0]
+
+        self.data['indicator']['K'] = self.__setdata__('%K', K, 'line')
+        self.data['indicator']['D'] = self.__setdata__(f'%D (n={d})', D, 'line')
+
+    @staticmethod
+    def warmup(n:int = 14, d:int = 3, tol:float = 1e-6):
+        '''
+        Number of bars needed before the first computed bar (exact, rolling windows)
+        '''
+        return n + d - 2
+
+
+class Correlation(_Indicator):
+
+    def __init__(self, stock, other, n:int = 20, tail:int = None, since = None):
+        '''
+        Rolling correlation of the returns of two stocks
+
+        :param stock: *Stock* object to apply the indicator
+        :param other: *Stock* object compared
+        :param n: Period
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
+        :returns: Dataframe
+        '''
+
+        self.name = "Correlation"
+
+        super().__init__(stock, tail=tail, since=since)
+
+        self.input:pd.DataFrame = self.__window__(self.warmup(n))['Close'].pct_change()
+        other_close = other._yfdata['Close'].astype(np.float64, copy=False)
+        if len(self.input) > 0:
+            other_close = other_close.iloc[other_close.index.searchsorted(self.input.index[0]):]
+        other_returns = other_close.pct_change().reindex(self.input.index)
+
+        corr = rol.rolling_corr(self.input, other_returns, n)
+        cov = rol.rolling_cov(self.input, other_returns, n)
+
+        self.data['indicator']['Correlation'] = self.__setdata__(f'Correlation {other.ticker} (n={n})', corr, 'line')
+        self.data['indicator']['Covariance'] = self.__setdata__(f'Covariance {other.ticker} (n={n})', cov, 'line')
+
+    @staticmethod
+    def warmup(n:int = 20, tol:float = 1e-6):
+        '''
+        Number of bars needed before the first computed bar (exact): previous close, then rolling window
+        '''
+        return n
@@ -69,7 +69,7 @@ class StockPlot():
         '''
         *go.Scatter object initialization*
         '''
-        dates=self.dates
+        dates=data.index
         self.line['x'] = dates
         self.line['y'] = data
         self.line['line']['color'] = color
@@ -78,21 +78,21 @@ class StockPlot():
         return go.Scatter(self.line)
 
     def __get_upperband__(self,data):
-        self.upperband['x'] = self.dates
+        self.upperband['x'] = data.index
         self.upperband['y'] = data
         self.upperband['name'] = data.Name
 
         return go.Scatter(self.upperband)
 
     def __get_lowerband__(self,data):
-        self.lowerband['x'] = self.dates
+        self.lowerband['x'] = data.index
         self.lowerband['y'] = data
         self.lowerband['name'] = data.Name
 
         return go.Scatter(self.lowerband)
 
     def __get_bar__(self, data):
-        self.bar['x'] = self.dates
+        self.bar['x'] = data.index
         self.bar['y'] = data
         self.bar['name'] = data.Name
 
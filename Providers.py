@@ -0,0 +1,343 @@
+import yfinance as yf
+import datetime as dt
+import pandas as pd
+import numpy as np
+import zlib
+import os
+from StockLib.utils import scrap_url, DATATYPE
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# yfinance intervals -> pandas frequencies
+_FREQ = {'m': 'min', 'h': 'h', 'd': 'D', 'wk': 'W', 'mo': 'MS'}
+# yfinance periods -> pandas offsets
+_PERIOD = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+
+def _split(value: str):
+    '''
+    Private split of a yfinance period / interval string: '15m' -> (15, 'm')
+    '''
+
+    digits = len(value) - len(value.lstrip('0123456789'))
+    return int(value[:digits] or 1), value[digits:]
+
+def _freq(interval: str):
+    '''
+    Private pandas frequency of a yfinance interval
+    '''
+
+    n, unit = _split(interval)
+    if unit not in _FREQ:
+        raise ValueError(f'Unknown interval: {interval}')
+    return f'{n}{_FREQ[unit]}'
+
+def _timestamp(date, index: pd.DatetimeIndex):
+    '''
+    Private conversion of a date to a timestamp comparable with the index
+    '''
+
+    date = pd.Timestamp(date)
+    if index.tz != None and date.tz == None:
+        return date.tz_localize(index.tz)
+    if index.tz == None and date.tz != None:
+        return date.tz_convert(None)
+    return date
+
+def _slice(df: pd.DataFrame, start = None, end = None, period: str = ''):
+    '''
+    Private selection of the bars between ``start`` (included) and ``end`` (excluded), or of the last ``period``
+    '''
+
+    if start != None:
+        df = df.iloc[df.index.searchsorted(_timestamp(start, df.index)):]
+    if end != None:
+        df = df.iloc[:df.index.searchsorted(_timestamp(end, df.index))]
+    if period not in ['', 'max'] and len(df) > 0:
+        if period == 'ytd':
+            first = df.index[-1].replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0, nanosecond=0)
+        else:
+            n, unit = _split(period)
+            if unit not in _PERIOD:
+                raise ValueError(f'Unknown period: {period}')
+            first = df.index[-1] - pd.DateOffset(**{_PERIOD[unit]: n})
+        df = df.iloc[df.index.searchsorted(first, side='right'):]
+    return df
+
+
+class DataProvider():
+    """
+    Base class of the data sources of a *Stock* or a *Bundle*
+
+    A provider returns OHLCV dataframes indexed by time. ``capabilities`` lists what it can do:
+
+    - 'range': start / end requests
+    - 'period': period requests (1d, 5d, 1mo, ...)
+    - 'bulk': many tickers in a single request (*fetch_bulk*)
+    - 'chunks': time ordered chunks of the history (*iter_chunks*) without loading it whole
+    - 'financials': financial statements
+    """
+
+    name: str = ''
+    capabilities: frozenset = frozenset(['range', 'period'])
+
+    def supports(self, capability: str):
+        '''
+        :param capability: Capability name
+        :returns: True if the provider has the capability
+        '''
+
+        return capability in self.capabilities
+
+    def fetch(self, ticker: str, start: dt.datetime = None, end: dt.datetime = None, period: str = '', interval: str = '1d'):
+        '''
+        OHLCV data of a ticker
+
+        :param ticker: Ticker
+        :param start: Beginning of the data (included)
+        :param end: End of the data (excluded)
+        :param period: Period to acquire instead of start / end (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max)
+        :param interval: Data frequency (1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo)
+        :returns: Dataframe
+        '''
+
+        raise NotImplementedError(f'{type(self).__name__} does not implement fetch')
+
+    def fetch_bulk(self, tickers: list[str], start: dt.datetime = None, end: dt.datetime = None, period: str = '', interval: str = '1d'):
+        '''
+        OHLCV data of many tickers, one request per ticker unless the provider is 'bulk' capable
+
+        :returns: Dictionnary ticker -> dataframe
+        '''
+
+        return {ticker: self.fetch(ticker, start, end, period, interval) for ticker in tickers}
+
+    def iter_chunks(self, ticker: str, start: dt.datetime = None, end: dt.datetime = None, chunksize: int = 1_000_000):
+        '''
+        Time ordered chunks of the OHLCV data of a ticker. The whole range in one chunk unless the provider is 'chunks' capable.
+
+        :param chunksize: Number of bars per chunk
+        :returns: Generator of dataframes
+        '''
+
+        df = self.fetch(ticker, start, end)
+        for i in range(0, len(df), chunksize):
+            yield df.iloc[i:i+chunksize]
+
+    def financials(self, ticker: str):
+        '''
+        Financial statements of a ticker
+
+        :returns: Dictionnary IncomeStatement / BalanceSheet / CashFlow
+        '''
+
+        raise NotImplementedError(f'{type(self).__name__} does not provide financials')
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(sorted(self.capabilities))})'
+
+
+class YFinanceProvider(DataProvider):
+    """
+    Data from `YahooFinance <https://finance.yahoo.com/>`_ (yfinance)
+    """
+
+    name = 'yfinance'
+    capabilities = frozenset(['range', 'period', 'bulk', 'financials'])
+
+    def __download__(self, tickers: list[str], start, end, period: str, interval: str, **kwargs):
+        if period != '':
+            return yf.download(tickers=tickers, period=period, interval=interval, auto_adjust=True, **kwargs)
+        if end == None:
+            end = dt.datetime.today()
+        return yf.download(tickers=tickers, start=start, end=end, interval=interval, auto_adjust=True, **kwargs)
+
+    def fetch(self, ticker: str, start: dt.datetime = None, end: dt.datetime = None, period: str = '', interval: str = '1d'):
+        return self.__download__([ticker], start, end, period, interval, multi_level_index=False)
+
+    def fetch_bulk(self, tickers: list[str], start: dt.datetime = None, end: dt.datetime = None, period: str = '', interval: str = '1d'):
+        '''
+        OHLCV data of many tickers in a single yfinance request
+
+        :returns: Dictionnary ticker -> dataframe
+        '''
+
+        data = self.__download__(list(tickers), start, end, period, interval, group_by='ticker')
+        frames = {}
+        for ticker in tickers:
+            if ticker in data.columns.get_level_values(0):
+                # Les lignes vides sont les dates des autres tickers
+                frames[ticker] = data[ticker][DATATYPE].dropna(how='all')
+            else:
+                frames[ticker] = pd.DataFrame(columns=DATATYPE)
+        return frames
+
+    def financials(self, ticker: str):
+        cfURL = 'https://finance.yahoo.com/quote/{tick}/cash-flow/'.format(tick=ticker)
+        bsURL = 'https://finance.yahoo.com/quote/{tick}/balance-sheet/'.format(tick=ticker)
+        isURL = 'https://finance.yahoo.com/quote/{tick}/financials/'.format(tick=ticker)
+        ticker_info = {}
+        ticker_info['IncomeStatement'] = scrap_url(isURL)
+        ticker_info['BalanceSheet'] = scrap_url(bsURL)
+        ticker_info['CashFlow'] = scrap_url(cfURL)
+        return ticker_info
+
+
+class LocalProvider(DataProvider):
+    """
+    Data from a local directory of CSV or Parquet files, one file per ticker (``{path}/{ticker}.csv`` or ``.parquet``,
+    dots of the ticker replaced by dashes), time ordered, with a date index and the OHLCV columns.
+    Files are read by chunks: only the requested range is kept in memory.
+    """
+
+    name = 'local'
+    capabilities = frozenset(['range', 'period', 'chunks'])
+
+    def __init__(self, path: str, format: str = None, chunksize: int = 1_000_000):
+        '''
+        Constructor
+
+        :param path: Directory of the files
+        :param format: 'csv' or 'parquet', guessed from the files if ommited (Parquet needs pyarrow)
+        :param chunksize: Number of rows read at once
+        '''
+
+        if format not in [None, 'csv', 'parquet']:
+            raise ValueError(f'Unknown format: {format}')
+        if format == 'parquet' and pq == None:
+            raise ImportError('pyarrow is required to read Parquet files')
+
+        self.path: str = path
+        self.format: str = format
+        self.chunksize: int = chunksize
+
+    def filepath(self, ticker: str):
+        '''
+        :returns: (file path, format) of a ticker
+        '''
+
+        name = str.replace(ticker, '.', '-')
+        formats = [self.format] if self.format != None else ['parquet', 'csv']
+        for fmt in formats:
+            filepath = os.path.join(self.path, f'{name}.{fmt}')
+            if os.path.exists(filepath):
+                if fmt == 'parquet' and pq == None:
+                    raise ImportError('pyarrow is required to read Parquet files')
+                return filepath, fmt
+        raise FileNotFoundError(f'No {" or ".join(formats)} file for {ticker} in {self.path}')
+
+    def __read__(self, ticker: str, chunksize: int):
+        '''
+        Raw chunks of the file of a ticker
+        '''
+
+        filepath, fmt = self.filepath(ticker)
+        if fmt == 'csv':
+            for chunk in pd.read_csv(filepath, index_col=0, parse_dates=[0], chunksize=chunksize):
+                yield chunk
+        else:
+            for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunksize):
+                chunk = batch.to_pandas()
+                if not isinstance(chunk.index, pd.DatetimeIndex):
+                    chunk = chunk.set_index(chunk.columns[0])
+                yield chunk
+
+    def iter_chunks(self, ticker: str, start: dt.datetime = None, end: dt.datetime = None, chunksize: int = None):
+        if chunksize == None:
+            chunksize = self.chunksize
+
+        for chunk in self.__read__(ticker, chunksize):
+            chunk.index = pd.DatetimeIndex(chunk.index)
+            if end != None and len(chunk) > 0 and chunk.index[0] >= _timestamp(end, chunk.index):
+                return
+            chunk = _slice(chunk, start, end)
+            if len(chunk) > 0:
+                yield chunk[[col for col in DATATYPE if col in chunk.columns]]
+
+    def fetch(self, ticker: str, start: dt.datetime = None, end: dt.datetime = None, period: str = '', interval: str = '1d'):
+        '''
+        Bars stored in the file of the ticker (the ``interval`` is the one of the file)
+        '''
+
+        chunks = list(self.iter_chunks(ticker, start, end))
+        if len(chunks) == 0:
+            return pd.DataFrame(columns=DATATYPE)
+        return _slice(pd.concat(chunks), period=period)
+
+
+class ReplayProvider(DataProvider):
+    """
+    Deterministic data, without network: replays recorded dataframes, or generates random walk bars
+    (same model as *Streaming.FakeFeed*) on a fixed calendar. The same request always gives the same bars,
+    whatever the process or the range requested, for benchmarks and offline tests.
+    """
+
+    name = 'replay'
+    capabilities = frozenset(['range', 'period', 'bulk', 'chunks'])
+
+    def __init__(self, data: dict = None, seed: int = 0, origin: dt.datetime = dt.datetime(2020, 1, 1), nbars: int = None, price: float = 100.):
+        '''
+        Constructor
+
+        :param data: Dictionnary ticker -> recorded dataframe, random walks generated if ommited
+        :param seed: Seed of the random walks
+        :param origin: Timestamp of the first generated bar
+        :param nbars: Number of generated bars per ticker, the bars of the 5 years following ``origin`` (at most 100 000) if ommited.
+            Periods requested without end are counted back from the last generated bar.
+        :param price: Starting price of the random walks
+        '''
+
+        self.data: dict = data
+        self.seed: int = seed
+        self.origin = pd.Timestamp(origin)
+        self.nbars: int = nbars
+        self.price: float = price
+
+    def __calendar__(self, interval: str):
+        '''
+        Private fixed calendar of the generated bars of an interval
+        '''
+
+        freq = _freq(interval)
+        if self.nbars != None:
+            return pd.date_range(self.origin, periods=self.nbars, freq=freq)
+
+        # Calendrier borné quel que soit l'intervalle : 100 000 jours sortiraient des dates pandas
+        end = self.origin + pd.DateOffset(years=5)
+        offset = pd.tseries.frequencies.to_offset(freq)
+        if isinstance(offset, pd.offsets.Tick):
+            end = min(end, self.origin + offset * 100_000)
+        return pd.date_range(self.origin, end, freq=freq, inclusive='left')[:100_000]
+
+    def __generate__(self, ticker: str, interval: str):
+        '''
+        Random walk bars of a ticker: one generator per field, seeded by the seed and the ticker
+        '''
+
+        index = self.__calendar__(interval)
+        nbars = len(index)
+        key = [self.seed, zlib.crc32(ticker.encode())]
+        returns = np.random.default_rng(key + [0]).normal(0, 1e-3, nbars)
+        spread = np.abs(np.random.default_rng(key + [1]).normal(0, 5e-4, nbars))
+        volume = np.random.default_rng(key + [2]).integers(100, 10000, nbars)
+
+        close = self.price * np.exp(np.cumsum(returns))
+        opn = np.concatenate([[self.price], close[:-1]])
+        return pd.DataFrame({
+            'Open': opn,
+            'High': np.maximum(opn, close) + spread*opn,
+            'Low': np.minimum(opn, close) - spread*opn,
+            'Close': close,
+            'Volume': volume
+            }, index=index)
+
+    def fetch(self, ticker: str, start: dt.datetime = None, end: dt.datetime = None, period: str = '', interval: str = '1d'):
+        if self.data != None:
+            if ticker not in self.data:
+                raise KeyError(f'No replay data for {ticker}')
+            df = self.data[ticker]
+        else:
+            df = self.__generate__(ticker, interval)
+        return _slice(df, start, end, period).copy()
@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+
+def _as_matrix(x):
+    '''
+    Private conversion of a serie or a dataframe to a float (time x column) array
+    '''
+
+    x = np.asarray(x, dtype=float)
+    return x.reshape(len(x), -1)
+
+def _like(result: np.ndarray, x):
+    '''
+    Private conversion of a (time x column) result back to the type and shape of the input
+    '''
+
+    if isinstance(x, pd.DataFrame):
+        return pd.DataFrame(result, index=x.index, columns=x.columns)
+    if isinstance(x, pd.Series):
+        return pd.Series(result[:, 0], index=x.index, name=x.name)
+    return result if np.ndim(x) == 2 else result[:, 0]
+
+
+def _rolling_moments(x: np.ndarray, y: np.ndarray, n, ddof: int = 1, block: int = 4096):
+    '''
+    Private single pass rolling moments of (time x column) arrays, for one window length or a vector of window lengths
+
+    Window sums are differences of cumulative sums, shared by all the window lengths. The sums restart on every block of bars and are
+    centered on the block mean, so the accumulated magnitude (and the cancellation in the variance) stays bounded.
+    A window holding a NaN gives NaN, as ``pd.DataFrame.rolling(n)``.
+
+    :param x: Array (time x column)
+    :param y: Array (time x column) for the covariance, None otherwise
+    :param n: Window length, or array of window lengths
+    :param ddof: Delta degrees of freedom
+    :param block: Number of bars per block
+    :returns: Dictionnary of arrays: 'mean', 'var' and, with ``y``, 'ymean', 'yvar', 'cov'.
+        Arrays (time x column) for a single window length, (window x time x column) otherwise
+    '''
+
+    T, N = x.shape
+    windows = np.atleast_1d(n).astype(int)
+    maxn = int(windows.max()) if len(windows) > 0 else 1
+    keys = ['mean', 'var'] if y is None else ['mean', 'var', 'ymean', 'yvar', 'cov']
+    # Fenêtre en premier axe : chaque fenêtre écrit des tranches contiguës
+    out = {key: np.full((len(windows), T, N), np.nan) for key in keys}
+
+    for b in range(0, T, block):
+        e = min(b + block, T)
+        lo = max(0, b - maxn + 1)
+
+        xs = x[lo:e]
+        valid = xs == xs
+        if y is not None:
+            ys = y[lo:e]
+            valid &= ys == ys
+        dense = valid.all()
+        count = None if dense else np.cumsum(np.vstack([np.zeros((1, N)), valid]), axis=0)
+
+        def sums(z):
+            # Colonne sans donnée dans le bloc : centre nul (np.nanmean avertirait)
+            center = np.where(valid, z, 0.).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+            z = z - center if dense else np.where(valid, z - center, 0.)
+            s1 = np.cumsum(np.vstack([np.zeros((1, N)), z]), axis=0)
+            s2 = np.cumsum(np.vstack([np.zeros((1, N)), z*z]), axis=0)
+            return z, center, s1, s2
+
+        zx, cx, s1x, s2x = sums(xs)
+        if y is not None:
+            zy, cy, s1y, s2y = sums(ys)
+            s1xy = np.cumsum(np.vstack([np.zeros((1, N)), zx*zy]), axis=0)
+
+        for p, w in enumerate(windows):
+            start = max(b, w - 1)
+            if start >= e:
+                continue
+            # Sommes des fenêtres finissant en t = start..e-1 : i = t - lo + 1, j = i - w
+            i = slice(start - lo + 1, e - lo + 1)
+            j = slice(start - lo + 1 - w, e - lo + 1 - w)
+            full = None if dense else (count[i] - count[j]) == w
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sx = s1x[i] - s1x[j]
+                moments = {'mean': sx/w + cx, 'var': np.maximum(s2x[i] - s2x[j] - sx*sx/w, 0.) / (w - ddof)}
+                if y is not None:
+                    sy = s1y[i] - s1y[j]
+                    moments['ymean'] = sy/w + cy
+                    moments['yvar'] = np.maximum(s2y[i] - s2y[j] - sy*sy/w, 0.) / (w - ddof)
+                    moments['cov'] = (s1xy[i] - s1xy[j] - sx*sy/w) / (w - ddof)
+
+            for key, value in moments.items():
+                if full is not None:
+                    value[~full] = np.nan
+                out[key][p, start:e] = value
+
+    if np.ndim(n) == 0:
+        return {key: arr[0] for key, arr in out.items()}
+    return out
+
+
+def rolling_mean_std(x, n: int, ddof: int = 1):
+    '''
+    Rolling mean and standard deviation in a single pass, same values as ``x.rolling(n).mean()`` and ``x.rolling(n).std()``
+
+    :param x: Serie, dataframe or array (time x column)
+    :param n: Window length
+    :param ddof: Delta degrees of freedom
+    :returns: (mean, std), same type as ``x``
+    '''
+
+    moments = _rolling_moments(_as_matrix(x), None, n, ddof)
+    return _like(moments['mean'], x), _like(np.sqrt(moments['var']), x)
+
+
+def rolling_cov(x, y, n: int, ddof: int = 1):
+    '''
+    Rolling covariance between the columns of ``x`` and ``y`` (a single serie ``y`` is compared to every column of ``x``)
+
+    :param x: Serie, dataframe or array (time x column)
+    :param y: Serie, dataframe or array with the same length
+    :param n: Window length
+    :param ddof: Delta degrees of freedom
+    :returns: Same type as ``x``
+    '''
+
+    X = _as_matrix(x)
+    Y = np.broadcast_to(_as_matrix(y), X.shape)
+    return _like(_rolling_moments(X, Y, n, ddof)['cov'], x)
+
+
+def rolling_corr(x, y, n: int):
+    '''
+    Rolling Pearson correlation between the columns of ``x`` and ``y`` (a single serie ``y`` is compared to every column of ``x``)
+
+    :param x: Serie, dataframe or array (time x column)
+    :param y: Serie, dataframe or array with the same length
+    :param n: Window length
+    :returns: Same type as ``x``
+    '''
+
+    X = _as_matrix(x)
+    Y = np.broadcast_to(_as_matrix(y), X.shape)
+    moments = _rolling_moments(X, Y, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = moments['cov'] / np.sqrt(moments['var'] * moments['yvar'])
+    return _like(np.clip(corr, -1., 1.), x)
+
+
+def decay_filter(x, r, y0 = 0., block: int = 32):
+    '''
+    Linear recursion ``y[t] = r*y[t-1] + x[t]`` from ``y[-1] = y0``, vectorized over time and over a vector of decay factors.
+    Every block of ``block`` bars is a product with the triangular matrices of the powers of ``r`` (all <= 1),
+    computed for all the factors in one matrix product, then the carries are propagated from block to block.
+
+    :param x: Input array
+    :param r: Decay factor, or array of decay factors
+    :param y0: Value before the first bar, per decay factor
+    :param block: Number of bars per block
+    :returns: Array like ``x`` for a single factor, array (time x factor) otherwise
+    '''
+
+    x = np.asarray(x, dtype=float)
+    factors = np.atleast_1d(np.asarray(r, dtype=float))
+    T, P = len(x), len(factors)
+    nblocks = -(-T // block)
+    X = np.zeros(nblocks*block)
+    X[:T] = x
+    X = X.reshape(nblocks, block)
+
+    # M[j, i, p] = r_p ** (i - j) sous la diagonale : les P matrices en un seul produit
+    k = np.arange(block)
+    lag = (k[:, None] - k[None, :]).T[:, :, None]
+    M = np.where(lag >= 0, factors ** np.maximum(lag, 0), 0.)
+    L = (X @ M.reshape(block, block*P)).reshape(nblocks, block, P)
+
+    carry = np.empty((nblocks, P))
+    c = np.array(np.broadcast_to(np.asarray(y0, dtype=float), (P,)))
+    rblock = factors ** block
+    for b in range(nblocks):
+        carry[b] = c
+        c = rblock*c + L[b, -1]
+    L += carry[:, None, :] * factors ** (k + 1)[:, None]
+
+    out = L.reshape(nblocks*block, P)[:T]
+    return out[:, 0] if np.ndim(r) == 0 else out
+
+
+def _rolling_extremum(x, n: int, accumulate):
+    '''
+    Private rolling max/min in O(T) whatever ``n`` (van Herk / Gil-Werman)
+
+    The series is cut in blocks of ``n`` bars. The extremum of a window is the extremum of the suffix
+    accumulation of the block where it starts and of the prefix accumulation of the block where it ends.
+    '''
+
+    X = _as_matrix(x)
+    T, N = X.shape
+    out = np.full((T, N), np.nan)
+    if n > T or n < 1:
+        return _like(out, x)
+
+    fill = -np.inf if accumulate is np.maximum else np.inf
+    nblocks = -(-T // n)
+    padded = np.full((nblocks*n, N), fill)
+    padded[:T] = np.where(X == X, X, fill)
+    blocks = padded.reshape(nblocks, n, N)
+
+    prefix = accumulate.accumulate(blocks, axis=1).reshape(-1, N)
+    suffix = accumulate.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, N)
+
+    t = np.arange(n - 1, T)
+    out[t] = accumulate(suffix[t - n + 1], prefix[t])
+
+    count = np.cumsum(np.vstack([np.zeros((1, N)), X == X]), axis=0)
+    out[t] = np.where(count[t + 1] - count[t + 1 - n] == n, out[t], np.nan)
+    return _like(out, x)
+
+
+def rolling_max(x, n: int):
+    '''
+    Rolling maximum, same values as ``x.rolling(n).max()``
+
+    :param x: Serie, dataframe or array (time x column)
+    :param n: Window length
+    :returns: Same type as ``x``
+    '''
+
+    return _rolling_extremum(x, n, np.maximum)
+
+
+def rolling_min(x, n: int):
+    '''
+    Rolling minimum, same values as ``x.rolling(n).min()``
+
+    :param x: Serie, dataframe or array (time x column)
+    :param n: Window length
+    :returns: Same type as ``x``
+    '''
+
+    return _rolling_extremum(x, n, np.minimum)
+
+
+def ewm_mean(x, alpha: float, min_periods: int = 0):
+    '''
+    Exponential weighted mean vectorized across the columns, same values as ``x.ewm(alpha=alpha, min_periods=min_periods).mean()``.
+    Loops over time instead of over columns: faster than pandas for wide frames (many tickers, short history).
+
+    :param x: Serie, dataframe or array (time x column)
+    :param alpha: Smoothing factor
+    :param min_periods: Minimal number of observations
+    :returns: Same type as ``x``
+    '''
+
+    X = _as_matrix(x)
+    T, N = X.shape
+    out = np.empty((T, N))
+
+    weighted = np.full(N, np.nan)
+    old_wt = np.ones(N)
+    nobs = np.zeros(N)
+    minp = max(min_periods, 1)
+
+    for t in range(T):
+        row = X[t]
+        obs = row == row
+        nobs += obs
+        started = weighted == weighted
+        old_wt = np.where(started, old_wt * (1 - alpha), old_wt)
+        update = started & obs
+        weighted = np.where(update, (old_wt*weighted + row) / (old_wt + 1), np.where(obs & ~started, row, weighted))
+        old_wt = np.where(update, old_wt + 1, old_wt)
+        out[t] = np.where(nobs >= minp, weighted, np.nan)
+
+    return _like(out, x)
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+import operator
+import ast
+import inspect
+import StockLib.Indicators as ind
+import StockLib.Rolling as rol
+
+FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+# Screen functions: name -> (formula on the wide frames, number of last bars needed for the last value)
+FUNCTIONS = {
+    'RSI': (
+        lambda d, n=14: ind.rsi(d['close'], n),
+        lambda tol, n=14: ind.RSI.warmup(n, tol) + 1
+        ),
+    'ATR': (
+        lambda d, n=14: ind.atr(d['high'], d['low'], d['close'], n)[1],
+        lambda tol, n=14: ind.ATR.warmup(n, tol) + 1
+        ),
+    'ADX': (
+        lambda d, n=14: ind.adx(d['high'], d['low'], d['close'], n),
+        lambda tol, n=14: ind.ADX.warmup(n, tol) + 1
+        ),
+    'MACD': (
+        lambda d, a=12, b=26, c=9: ind.macd(d['close'], a, b, c)[0],
+        lambda tol, a=12, b=26, c=9: max(b, ind._ewm_warmup(2/(max(a, b)+1), tol)) + 1
+        ),
+    'MACD_SIGNAL': (
+        lambda d, a=12, b=26, c=9: ind.macd(d['close'], a, b, c)[1],
+        lambda tol, a=12, b=26, c=9: ind.MACD.warmup(a, b, c, tol) + 1
+        ),
+    'EMA': (
+        lambda d, n=20: ind._ewm(d['close'], 2/(n+1), n),
+        lambda tol, n=20: max(n, ind._ewm_warmup(2/(n+1), tol)) + 1
+        ),
+    'SMA': (
+        lambda d, n=20: rol.rolling_mean_std(d['close'], n)[0],
+        lambda tol, n=20: n
+        ),
+    'BB_UPPER': (
+        lambda d, n=20, k=2: ind.bollinger(d['close'], n, k)[0],
+        lambda tol, n=20, k=2: ind.BollingerBands.warmup(n, k) + 1
+        ),
+    'BB_LOWER': (
+        lambda d, n=20, k=2: ind.bollinger(d['close'], n, k)[1],
+        lambda tol, n=20, k=2: ind.BollingerBands.warmup(n, k) + 1
+        ),
+    'HIGHEST': (
+        lambda d, n=20: rol.rolling_max(d['high'], n),
+        lambda tol, n=20: ind.DonchianChannels.warmup(n) + 1
+        ),
+    'LOWEST': (
+        lambda d, n=20: rol.rolling_min(d['low'], n),
+        lambda tol, n=20: ind.DonchianChannels.warmup(n) + 1
+        ),
+}
+
+_COMPARE = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Eq: operator.eq, ast.NotEq: operator.ne}
+_BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+
+class Screen():
+    """
+    Screening expression over the last values of the stocks of a *Bundle*
+
+    Example: ``RSI(14) < 30 and ADX(14) > 25 and close > BB_UPPER(20, 2)``
+    """
+
+    def __init__(self, expr: str, tol: float = 1e-6):
+        '''
+        Parses the expression. Accepted terms: OHLCV fields, numbers, the functions of ``FUNCTIONS``
+        with numeric arguments, + - * /, comparisons, and / or / not, parentheses.
+
+        :param expr: Screening expression
+        :param tol: Tolerance of the EWM based indicators computed on a tail of the history only
+        '''
+
+        self.expr: str = expr
+        self.tol: float = tol
+        self.terms: dict = {}
+
+        try:
+            tree = ast.parse(expr.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f'Invalid screen expression: {expr} ({e.msg})')
+        self._tree = tree.body
+        self.__check__(self._tree)
+
+        self.tails: dict = {term: FUNCTIONS[name][1](tol, *args) for term, (name, args) in self.terms.items()}
+
+    def __check__(self, node):
+        '''
+        Validates the expression tree and registers the indicator terms it needs
+        '''
+
+        match node:
+            case ast.BoolOp() | ast.Compare() | ast.BinOp() | ast.UnaryOp():
+                if isinstance(node, ast.BoolOp) and not isinstance(node.op, (ast.And, ast.Or)):
+                    raise ValueError(f'Operator not allowed in screen: {ast.unparse(node)}')
+                if isinstance(node, ast.Compare) and not all(type(op) in _COMPARE for op in node.ops):
+                    raise ValueError(f'Comparison not allowed in screen: {ast.unparse(node)}')
+                if isinstance(node, ast.BinOp) and type(node.op) not in _BINARY:
+                    raise ValueError(f'Operator not allowed in screen: {ast.unparse(node)}')
+                if isinstance(node, ast.UnaryOp) and not isinstance(node.op, (ast.Not, ast.USub)):
+                    raise ValueError(f'Operator not allowed in screen: {ast.unparse(node)}')
+                for child in ast.iter_child_nodes(node):
+                    if not isinstance(child, (ast.boolop, ast.cmpop, ast.operator, ast.unaryop)):
+                        self.__check__(child)
+
+            case ast.Constant(value=value) if isinstance(value, (int, float)) and not isinstance(value, bool):
+                pass
+
+            case ast.Name(id=name) if name.lower() in FIELDS:
+                pass
+
+            case ast.Call(func=ast.Name(id=name), args=args, keywords=[]) if name.upper() in FUNCTIONS:
+                values = []
+                for arg in args:
+                    if isinstance(arg, ast.UnaryOp) and isinstance(arg.op, ast.USub) and isinstance(arg.operand, ast.Constant):
+                        values.append(-arg.operand.value)
+                    elif isinstance(arg, ast.Constant) and isinstance(arg.value, (int, float)):
+                        values.append(arg.value)
+                    else:
+                        raise ValueError(f'Arguments of {name} must be numbers')
+                try:
+                    inspect.signature(FUNCTIONS[name.upper()][0]).bind(None, *values)
+                except TypeError:
+                    raise ValueError(f'Invalid screen expression: {self.expr} (wrong number of arguments for {name})')
+                self.terms[ast.unparse(node)] = (name.upper(), tuple(values))
+
+            case _:
+                raise ValueError(f'Term not allowed in screen: {ast.unparse(node)}')
+
+    def evaluate(self, data: dict):
+        '''
+        Evaluates the expression on the tail of the wide OHLCV frames
+
+        :param data: Dictionnary field -> dataframe (time x ticker), e.g. ``{'close': bundle.close, ...}``
+        :returns: Dataframe of the last value of every term (ticker x term), with a 'match' boolean column
+        '''
+
+        values = {}
+        for term, (name, args) in self.terms.items():
+            # Every term only sees the tail its own window needs
+            tail = {field: df.iloc[-self.tails[term]:].astype(np.float64, copy=False) for field, df in data.items()}
+            values[term] = FUNCTIONS[name][0](tail, *args).iloc[-1].to_numpy(dtype=float)
+        last = {field: df.iloc[-1].to_numpy(dtype=float) for field, df in data.items()}
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            match = np.asarray(self.__eval__(self._tree, values, last), dtype=bool)
+
+        columns = next(iter(data.values())).columns
+        res = pd.DataFrame(values, index=columns)
+        res['match'] = np.broadcast_to(match, len(columns))
+        return res
+
+    def __eval__(self, node, values: dict, last: dict):
+
+        match node:
+            case ast.BoolOp(op=ast.And(), values=operands):
+                res = True
+                for operand in operands:
+                    res = res & self.__eval__(operand, values, last)
+                return res
+            case ast.BoolOp(op=ast.Or(), values=operands):
+                res = False
+                for operand in operands:
+                    res = res | self.__eval__(operand, values, last)
+                return res
+            case ast.UnaryOp(op=ast.Not(), operand=operand):
+                return ~np.asarray(self.__eval__(operand, values, last), dtype=bool)
+            case ast.UnaryOp(op=ast.USub(), operand=operand):
+                return -self.__eval__(operand, values, last)
+            case ast.Compare(left=left, ops=ops, comparators=comparators):
+                res = True
+                a = self.__eval__(left, values, last)
+                for op, right in zip(ops, comparators):
+                    b = self.__eval__(right, values, last)
+                    res = res & _COMPARE[type(op)](a, b)
+                    a = b
+                return res
+            case ast.BinOp(left=left, op=op, right=right):
+                return _BINARY[type(op)](self.__eval__(left, values, last), self.__eval__(right, values, last))
+            case ast.Constant(value=value):
+                return value
+            case ast.Name(id=name):
+                return last[name.lower()]
+            case ast.Call():
+                return values[ast.unparse(node)]
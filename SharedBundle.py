@@ -0,0 +1,304 @@
+import numpy as np
+import pandas as pd
+import json
+import time
+from multiprocessing import shared_memory, resource_tracker
+from StockLib.utils import DATATYPE
+from StockLib.Screen import Screen
+
+FIELDS = [dtype.lower() for dtype in DATATYPE]
+
+def _attach(name: str):
+    '''
+    Private attachment to an existing shared memory block. The block belongs to the server: it must not be
+    registered to the resource tracker of the client, which would unlink it when the client exits.
+    '''
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 : pas d'option track, l'enregistrement est court-circuité
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+def _release(shm: shared_memory.SharedMemory, stale: list):
+    '''
+    Private closing of a block, postponed while arrays still use its memory
+    '''
+
+    try:
+        shm.close()
+    except BufferError:
+        stale.append(shm)
+
+
+class BundleServer():
+    """
+    Publishes the wide OHLCV frames of a *Bundle* in shared memory, for the *BundleClient* of the other processes of the host.
+
+    Every publication is a new generation of blocks (``{name}_{version}_{field}``), never modified once published:
+    clients read consistent data without locks. The ``{name}`` block holds the version of the last generation.
+
+    The server process keeps the data of every stock of the bundle (needed to append bars and compute indicators)
+    next to the shared blocks: the memory saved is the one of the clients, which do not load their own bundle.
+    """
+
+    def __init__(self, bundle, name: str = 'stocklib'):
+        '''
+        Constructor, publishes the current data of the bundle
+
+        :param bundle: *Bundle* published
+        :param name: Name of the shared data, used by the clients
+        '''
+
+        self.bundle = bundle
+        self.name: str = name
+        self.version: int = 0
+        self._blocks: list = []
+
+        self._header = shared_memory.SharedMemory(name=name, create=True, size=16)
+        self._version = np.ndarray(1, dtype=np.int64, buffer=self._header.buf)
+        self._version[0] = 0
+        self.publish()
+
+    def publish(self):
+        '''
+        Copies the current data of the bundle in a new generation of blocks, then removes the previous one.
+        The wide frames of the bundle are rebuilt from its stocks for the copy and dropped afterwards, the data of the
+        stocks is kept: the server holds the stocks and the shared blocks, plus the wide frames while publishing.
+
+        :returns: New version
+        '''
+
+        frames = {field: getattr(self.bundle, field) for field in FIELDS}
+        close = frames['close']
+        frames = {field: df.reindex(index=close.index, columns=close.columns) for field, df in frames.items()}
+        index = pd.DatetimeIndex(close.index)
+        version = self.version + 1
+
+        meta = {
+            'tickers': [str(ticker) for ticker in close.columns],
+            'nbars': len(close),
+            'tz': str(index.tz) if index.tz != None else None,
+            'index_name': index.name,
+            # Type commun à toutes les colonnes : un volume int64 ne doit pas recevoir les NaN d'un autre calendrier
+            'dtypes': {field: np.result_type(*df.dtypes).str if df.shape[1] > 0 else np.dtype(np.float64).str for field, df in frames.items()},
+            'time': time.time()
+        }
+
+        blocks = []
+        stamps = (index.tz_convert('UTC').tz_localize(None) if index.tz != None else index).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        arrays = {'index': stamps}
+        for field, df in frames.items():
+            arrays[field] = np.ascontiguousarray(df.to_numpy(dtype=meta['dtypes'][field]))
+
+        for key, arr in arrays.items():
+            shm = shared_memory.SharedMemory(name=f'{self.name}_{version}_{key}', create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            blocks.append(shm)
+
+        content = json.dumps(meta).encode()
+        shm = shared_memory.SharedMemory(name=f'{self.name}_{version}_meta', create=True, size=len(content))
+        shm.buf[:len(content)] = content
+        blocks.append(shm)
+
+        # La version est écrite en dernier : la génération est complète quand les clients la voient
+        self._version[0] = version
+        self.version = version
+        self.__unlink__(self._blocks)
+        self._blocks = blocks
+
+        for field in FIELDS:
+            self.bundle.__dict__.pop(field, None)
+        return version
+
+    def append_bars(self, bars: dict, index = None, persist: bool = True):
+        '''
+        Appends bars to the bundle (see *Bundle.append_bars*) and publishes the new data.
+        Every publication copies the whole bundle: with a fast feed, append to the bundle and publish periodically instead.
+
+        :returns: New version
+        '''
+
+        self.bundle.append_bars(bars, index, persist)
+        return self.publish()
+
+    def download(self, *args, **kwargs):
+        '''
+        Downloads the bundle data (see *Bundle.download*) and publishes it
+
+        :returns: New version
+        '''
+
+        self.bundle.download(*args, **kwargs)
+        return self.publish()
+
+    def __unlink__(self, blocks: list):
+        for shm in blocks:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        '''
+        Removes the shared data. Clients keep the generation they are attached to.
+        '''
+
+        self.__unlink__(self._blocks)
+        self._blocks = []
+        del self._version
+        self.__unlink__([self._header])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class BundleClient():
+    """
+    Read-only access to the data published by a *BundleServer* of the same host, without copy:
+    ``open``, ``high``, ``low``, ``close`` and ``volume`` are dataframes (time x ticker) over the shared memory.
+    """
+
+    def __init__(self, name: str = 'stocklib', timeout: float = 0.):
+        '''
+        Constructor, attaches to the last published version
+
+        :param name: Name of the shared data (see *BundleServer*)
+        :param timeout: Time waited for the server to start (seconds)
+        '''
+
+        self.name: str = name
+        self.version: int = 0
+        self.tickers: list[str] = []
+        self.index: pd.DatetimeIndex = pd.DatetimeIndex([])
+        self._blocks: list = []
+        self._stale: list = []
+
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self._header = _attach(name)
+                break
+            except FileNotFoundError:
+                if time.time() >= deadline:
+                    raise FileNotFoundError(f'No bundle server named {name}')
+                time.sleep(0.05)
+        self._version = np.ndarray(1, dtype=np.int64, buffer=self._header.buf)
+        self.refresh()
+
+    @property
+    def latest(self):
+        '''
+        Last version published by the server
+        '''
+
+        return int(self._version[0])
+
+    def changed(self):
+        '''
+        :returns: True if the server published data newer than the attached one
+        '''
+
+        return self.latest != self.version
+
+    def refresh(self):
+        '''
+        Attaches to the last published version if it changed
+
+        :returns: True if the data changed
+        '''
+
+        if not self.changed():
+            return False
+
+        while True:
+            version = self.latest
+            try:
+                blocks, frames = self.__attach__(version)
+                break
+            except FileNotFoundError:
+                # Génération supprimée entre temps : une plus récente est publiée
+                if self.latest == version:
+                    raise
+
+        old = self._blocks
+        self._blocks = blocks
+        self.version = version
+        for field, df in frames.items():
+            setattr(self, field, df)
+        stale, self._stale = old + self._stale, []
+        for shm in stale:
+            _release(shm, self._stale)
+        return True
+
+    def __attach__(self, version: int):
+        '''
+        Read-only views over the blocks of a generation
+        '''
+
+        blocks = []
+        try:
+            shm = _attach(f'{self.name}_{version}_meta')
+            blocks.append(shm)
+            meta = json.loads(bytes(shm.buf).rstrip(b'\x00').decode())
+
+            shm = _attach(f'{self.name}_{version}_index')
+            blocks.append(shm)
+            stamps = np.ndarray(meta['nbars'], dtype=np.int64, buffer=shm.buf)
+            index = pd.DatetimeIndex(stamps.view('datetime64[ns]'), name=meta['index_name'])
+            if meta['tz'] != None:
+                index = index.tz_localize('UTC').tz_convert(meta['tz'])
+
+            frames = {}
+            shape = (meta['nbars'], len(meta['tickers']))
+            for field in FIELDS:
+                shm = _attach(f'{self.name}_{version}_{field}')
+                blocks.append(shm)
+                arr = np.ndarray(shape, dtype=np.dtype(meta['dtypes'][field]), buffer=shm.buf)
+                arr.flags.writeable = False
+                frames[field] = pd.DataFrame(arr, index=index, columns=meta['tickers'], copy=False)
+        except FileNotFoundError:
+            for shm in blocks:
+                _release(shm, self._stale)
+            raise
+
+        self.tickers = meta['tickers']
+        self.index = index
+        return blocks, frames
+
+    def screen(self, expr: str, tol: float = 1e-6):
+        """
+        Stocks matching a screening expression on the shared data (see *Bundle.screen*)
+
+        :returns: Dataframe of the last value of every term, for the matching tickers
+        """
+
+        res = Screen(expr, tol).evaluate({field: getattr(self, field) for field in FIELDS})
+        return res[res['match']].drop(columns='match')
+
+    def detach(self):
+        '''
+        Detaches from the shared data (the dataframes of the client can no longer be used)
+        '''
+
+        for field in FIELDS:
+            self.__dict__.pop(field, None)
+        del self._version
+        for shm in self._blocks + self._stale + [self._header]:
+            _release(shm, [])
+        self._blocks, self._stale = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.detach()
@@ -1,30 +1,39 @@
-import yfinance as yf
 import datetime as dt
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from StockLib.utils import scrap_url, create_arbo
+from StockLib.utils import create_arbo, DATATYPE, dtype_policy, cast_data
 from StockLib.PlotlyStock import StockPlot
 import StockLib.Indicators as ind
+import StockLib.Sweep as sweep
+from StockLib.Streaming import BarBuffer, StreamingIndicator
+from StockLib.Storage import SegmentLog
+from StockLib.Providers import DataProvider, YFinanceProvider
+from StockLib.Chunked import run_chunked
 import types
 import os
 
-DATATYPE = ['Open','High','Low','Close','Volume']
-
 class Stock:
     """
     *Stock* class storing stock infos and methods
     """
 
-    def __init__(self, ticker: str, local_data:dict = None):
+    def __init__(self, ticker: str, local_data:dict = None, provider: DataProvider = None, dtype = 'float64'):
         """
         Class constructor creating a *Stock* instance
 
         :param ticker: 
         Ticker string (yfinance)
+        :param provider: Data source of *download* (*Providers.DataProvider*), yfinance if ommited
+        :param dtype: Dtype policy of the data and indicators, 'float64', 'float32' (float32 prices, int64 volume) or 'compact' (uint32 volume), see *utils.DTYPES*
         """
 
         self.ticker:str = ticker
+        self.provider: DataProvider = provider if provider != None else YFinanceProvider()
+        self.dtypes: dict = dtype_policy(dtype)
+        self.streams: list = []
+        self.listeners: list = []
         self.load_local(local_data)           
         self.indicators: dict = {}
 
@@ -33,6 +42,7 @@ class Stock:
 
         self._arbo: dict = {}
         self._yfdata: pd.DataFrame = pd.DataFrame()
+        self._buffer: BarBuffer = None
 
         # Définir les valeurs par défaut
         default_path = os.getcwd() + '/StockData'
@@ -64,15 +74,23 @@ class Stock:
         self._arbo['svg'] = {}
         self._arbo['svg']['path'] = arb[2]
         self._arbo['svg']['filepath'] = arb[2] + '/{}.svg'.format(str.replace(self.ticker, '.', '-'))
+        self._arbo['log'] = {}
+        self._arbo['log']['compact_bytes'] = local_data.get('compact_bytes', 16*2**20)
         self._arbo['overwrite'] = default_overwrite
+        self._arbo['dirty'] = False
+        # Erreur de lecture d'un snapshot existant : ni replay ni compaction, qui l'écraserait avec des données partielles
+        self._arbo['unreadable'] = None
+        self._log = SegmentLog(arb[1], str.replace(self.ticker, '.', '-'))
 
 
         # Charger les données si elles existent et si l'utilisateur ne demande pas de les ignorer
+        # Segments listés avant le snapshot : une compaction concurrente ne peut pas faire perdre de données
+        segments = self._log.segments()
 
         try:
             
             print(self._arbo['json']['filepath'])
-            self._yfdata = pd.read_json(self._arbo['json']['filepath'])
+            self._yfdata = cast_data(pd.read_json(self._arbo['json']['filepath']), self.dtypes)
             self._arbo['loaded'] = True
 
             self.date = self._arbo['date']
@@ -86,7 +104,11 @@ class Stock:
 
         except Exception as e:
             self._arbo['loaded'] = False
-            self.__stockprint__(f'Error loading data: {e}')
+            self._arbo['unreadable'] = e
+            self.__stockprint__(f'Error loading data: {e}. Log not replayed and compaction disabled until the data is downloaded again.')
+
+        if self._arbo['unreadable'] == None:
+            self.__replaylog__(segments)
             
 
     def datachecker(fun):
@@ -96,6 +118,34 @@ class Stock:
             return fun(self, *args, **kwargs)
         return wrapper
 
+    def __replaylog__(self, segments: list[str]):
+        '''
+        Appends the bars of the log segments not yet compacted in the JSON snapshot
+
+        :param segments: Segments listed before reading the snapshot
+        '''
+
+        # Same timezone as the snapshot (naive UTC once reloaded from JSON)
+        tz = getattr(self._yfdata.index, 'tz', None) if not self._yfdata.empty else 'UTC'
+        try:
+            bars = self._log.read(segments, tz)
+        except FileNotFoundError:
+            # Compaction terminée entre temps : le nouveau snapshot contient les segments supprimés
+            segments = self._log.segments()
+            self._yfdata = cast_data(pd.read_json(self._arbo['json']['filepath']), self.dtypes)
+            self._arbo['loaded'] = True
+            self.__setvalues__()
+            return self.__replaylog__(segments)
+
+        if len(bars) == 0:
+            return
+        if not self._yfdata.empty:
+            bars = bars[bars.index > self._yfdata.index[-1]]
+        if len(bars) == 0:
+            return
+        self.append_bars(bars, persist=False)
+        self.__stockprint__(f'{len(bars)} bars replayed from log.')
+
     @datachecker
     def __setvalues__(self):
         for dtype in DATATYPE:
@@ -114,50 +164,114 @@ class Stock:
                     )
 
     @datachecker
-    def MACD(self,serie=pd.DataFrame(),a:float = 12,b:float = 26,c:float = 9):
+    def MACD(self,serie=pd.DataFrame(),a:float = 12,b:float = 26,c:float = 9, tail:int = None, since = None):
         '''
         Mean Averaged Convergence Divergence (Indicator)
 
         :param a: EMA Slow
         :param b: EMA Fast
         :param c: Signal
+        :param tail: Number of last bars computed, the whole history if ommited
+        :param since: First date computed, the whole history if ommited
         :returns: Dataframe
         '''
 
-        self.indicators['MACD'] = ind.MACD(self,serie,a,b,c)
+        self.indicators['MACD'] = ind.MACD(self,serie,a,b,c,tail=tail,since=since)
         return self.indicators['MACD']
     
     @datachecker
-    def ATR(self, n:int = 14):
+    def ATR(self, n:int = 14, tail:int = None, since = None):
         '''
-        Average True Rate
+        Average True Rate, on the last ``tail`` bars or ``since`` a date only if given
         '''
-        self.indicators['ATR'] = ind.ATR(self,n)
+        self.indicators['ATR'] = ind.ATR(self,n,tail=tail,since=since)
         return self.indicators['ATR'].get_rawdata()['indicator']
 
     @datachecker
-    def BollingerBands(self, n:int = 14, k:float = 2):
+    def BollingerBands(self, n:int = 14, k:float = 2, tail:int = None, since = None):
         '''
-        Bollinger Bands
+        Bollinger Bands, on the last ``tail`` bars or ``since`` a date only if given
         '''
-        self.indicators['Bollinger Bands'] = ind.BollingerBands(self,n,k)
+        self.indicators['Bollinger Bands'] = ind.BollingerBands(self,n,k,tail=tail,since=since)
         return self.indicators['Bollinger Bands'].get_rawdata()['onstock']
     
     @datachecker
-    def RSI(self, n:int = 14):
+    def RSI(self, n:int = 14, tail:int = None, since = None):
         '''
-        Relative Strength Index
+        Relative Strength Index, on the last ``tail`` bars or ``since`` a date only if given
         '''
-        self.indicators['RSI'] = ind.RSI(self,n)
-        return ind.RSI(self,n).get_rawdata()['indicator']
+        self.indicators['RSI'] = ind.RSI(self,n,tail=tail,since=since)
+        return self.indicators['RSI'].get_rawdata()['indicator']
     
     @datachecker
-    def ADX(self, n:int = 14):
+    def ADX(self, n:int = 14, tail:int = None, since = None):
+        '''
+        Average Directional Index, on the last ``tail`` bars or ``since`` a date only if given
+        '''
+        self.indicators['ADX'] = ind.ADX(self,n,tail=tail,since=since)
+        return self.indicators['ADX'].get_rawdata()['indicator']
+
+    @datachecker
+    def DonchianChannels(self, n:int = 20, tail:int = None, since = None):
+        '''
+        Donchian Channels, on the last ``tail`` bars or ``since`` a date only if given
+        '''
+        self.indicators['Donchian Channels'] = ind.DonchianChannels(self,n,tail=tail,since=since)
+        return self.indicators['Donchian Channels'].get_rawdata()['onstock']
+
+    @datachecker
+    def Stochastic(self, n:int = 14, d:int = 3, tail:int = None, since = None):
+        '''
+        Stochastic Oscillator, on the last ``tail`` bars or ``since`` a date only if given
+        '''
+        self.indicators['Stochastic'] = ind.Stochastic(self,n,d,tail=tail,since=since)
+        return self.indicators['Stochastic'].get_rawdata()['indicator']
+
+    @datachecker
+    def Correlation(self, other, n:int = 20, tail:int = None, since = None):
+        '''
+        Rolling correlation of the returns with another *Stock*, on the last ``tail`` bars or ``since`` a date only if given
+        '''
+        self.indicators['Correlation'] = ind.Correlation(self,other,n,tail=tail,since=since)
+        return self.indicators['Correlation'].get_rawdata()['indicator']
+
+    @datachecker
+    def RSI_sweep(self, windows: list[int]):
+        '''
+        Relative Strength Index for many periods at once
+
+        :param windows: Periods
+        :returns: Dataframe (time x period)
+        '''
+        values = sweep.rsi_sweep(self._yfdata['Close'], windows).astype(self.dtypes['indicators'], copy=False)
+        return pd.DataFrame(values, index=self._yfdata.index, columns=list(windows))
+
+    @datachecker
+    def ATR_sweep(self, windows: list[int]):
         '''
-        Average Directional Index
+        Average True Rate for many periods at once
+
+        :param windows: Periods
+        :returns: Dataframe (time x period)
         '''
-        self.indicators['ADX'] = ind.ADX(self,n)
-        return ind.ADX(self,n).get_rawdata()['indicator']
+        df = self._yfdata
+        values = sweep.atr_sweep(df['High'], df['Low'], df['Close'], windows).astype(self.dtypes['indicators'], copy=False)
+        return pd.DataFrame(values, index=df.index, columns=list(windows))
+
+    @datachecker
+    def BollingerBands_sweep(self, windows: list[int], k: float = 2):
+        '''
+        Bollinger Bands for many periods at once
+
+        :param windows: Periods
+        :param k: Multiplier
+        :returns: Dataframe with (band, period) columns
+        '''
+        bands = sweep.bollinger_sweep(self._yfdata['Close'], windows, k)
+        return pd.concat(
+            {key: pd.DataFrame(band.astype(self.dtypes['indicators'], copy=False), index=self._yfdata.index, columns=list(windows)) for key, band in bands.items()},
+            axis=1
+            )
 
     @datachecker
     def pct(self,serie:pd.DataFrame = pd.DataFrame()):
@@ -168,6 +282,136 @@ class Stock:
             serie = self._yfdata
         return serie.pct_change()
 
+    def add_listener(self, listener):
+        '''
+        Registers a function called by *append_bars* after the streaming indicators are updated (e.g. *Alerts.AlertEngine.on_bars*)
+
+        :param listener: Function (stock, index, bars), ``bars`` being the bar dictionnary or the OHLCV dataframe appended
+        '''
+
+        self.listeners.append(listener)
+
+    def add_stream(self, indicator: StreamingIndicator):
+        '''
+        Registers a streaming indicator updated by *append_bars*. The indicator is warmed up on the loaded data.
+
+        :param indicator: *Streaming.StreamingIndicator* object
+        :returns: The indicator
+        '''
+
+        if not self._yfdata.empty:
+            indicator.update_many(self._yfdata)
+        self.streams.append(indicator)
+        return indicator
+
+    def process_chunks(self,
+                       indicators: list[StreamingIndicator],
+                       filepath: str = None,
+                       start: dt.datetime = None,
+                       end: dt.datetime = None,
+                       chunksize: int = 1_000_000,
+                       format: str = 'csv',
+                       ohlcv: bool = False):
+        '''
+        Out-of-core computation of streaming indicators over the whole history of the provider (e.g. a *LocalProvider* archive),
+        read and written chunk after chunk: the memory used is bounded by ``chunksize``, not by the history length.
+        The data of the stock is not loaded nor modified.
+
+        :param indicators: *Streaming.StreamingIndicator* objects, left in their final state (they can then be added with *add_stream*)
+        :param filepath: Output file, ``{ticker}_chunks.{format}`` in the data directory of the stock if ommited
+        :param start: Beginning of the data (included)
+        :param end: End of the data (excluded)
+        :param chunksize: Number of bars per chunk
+        :param format: 'csv' or 'parquet'
+        :param ohlcv: Writes the OHLCV data along the indicators
+        :returns: Path of the output file
+        '''
+
+        if filepath == None:
+            filepath = self._arbo['datepath'] + '/{}_chunks.{}'.format(str.replace(self.ticker, '.', '-'), format)
+
+        nbars = run_chunked(self.provider, self.ticker, indicators, filepath, start, end, chunksize, format, ohlcv, self.dtypes)
+        self.__stockprint__(f'PROCESS CHUNKS - {nbars} bars written to {filepath}')
+        return filepath
+
+    def append_bars(self, bars, index = None, persist: bool = True):
+        '''
+        Appends new bars to the stock without reloading the whole history
+
+        :param bars: OHLCV dataframe, or dictionnary of a single bar
+        :param index: Timestamp of the bar when ``bars`` is a dictionnary, now if ommited
+        :param persist: Appends the bars to the log of the stock
+        '''
+
+        if isinstance(bars, dict):
+            index = pd.Timestamp(dt.datetime.now() if index == None else index)
+            values = bars
+            rows = [(index, bars)]
+        else:
+            index = bars.index
+            values = {col: bars[col].to_numpy() for col in DATATYPE}
+            rows = zip(index, bars[DATATYPE].to_dict('records'))
+
+        if self._buffer == None:
+            if self._yfdata.empty:
+                dtypes = {col: self.dtypes['prices'] for col in DATATYPE}
+                dtypes['Volume'] = self.dtypes['volume'] if self.dtypes['volume'] != None else np.asarray(values.get('Volume', np.nan)).dtype
+                self._buffer = BarBuffer(dtypes=dtypes)
+            else:
+                self._buffer = BarBuffer.from_frame(self._yfdata)
+
+        self._buffer.append(index, values)
+        self._arbo['loaded'] = True
+        # Views are rebuilt from the buffer on their next access (see __getattr__)
+        for name in ['_yfdata'] + [dtype.lower() for dtype in DATATYPE]:
+            self.__dict__.pop(name, None)
+
+        for stream in self.streams:
+            if isinstance(bars, dict):
+                stream.update(bars)
+            else:
+                stream.update_many(bars)
+        # Log écrit avant les listeners : une erreur dans un listener ne fait pas perdre la barre
+        if persist:
+            self.__writelog__(rows)
+        for listener in self.listeners:
+            listener(self, index, bars)
+
+    def __getattr__(self, name: str):
+        if name in ['_yfdata'] + [dtype.lower() for dtype in DATATYPE] and self.__dict__.get('_buffer') != None:
+            self._yfdata = self._buffer.frame()
+            self.__setvalues__()
+            return self.__dict__[name]
+        raise AttributeError(f"'Stock' object has no attribute '{name}'")
+
+    def __writelog__(self, rows):
+        '''
+        Appends bars to the log of the stock, compacts the log in the background when it grows too large
+
+        :param rows: Iterable of (timestamp, bar dictionnary)
+        '''
+
+        try:
+            self._log.append(rows)
+        except FileNotFoundError:
+            self.__stockprint__('Log not written, data directory missing.')
+            return
+
+        if self._log.nbytes > self._arbo['log']['compact_bytes'] and self._arbo['unreadable'] == None:
+            self.compact()
+
+    def compact(self, background: bool = True):
+        '''
+        Writes the JSON snapshot of the stock and deletes the log segments it covers
+
+        :param background: Writes the snapshot in a thread
+        '''
+
+        if self._arbo['unreadable'] != None:
+            raise ValueError(f'Unreadable snapshot {self._arbo["json"]["filepath"]} ({self._arbo["unreadable"]}), not overwritten with partial data: download the data again')
+        self._log.compact(self._yfdata, self._arbo['json']['filepath'], background)
+        self._arbo['dirty'] = False
+
     def download(self, 
                  start: dt.datetime = None,
                  end: dt.datetime = None,
@@ -176,7 +420,7 @@ class Stock:
                  datatype: str = 'all',
                  overwrite: bool = True):
         """
-        Method dowloading stock info via `YahooFinance <https://finance.yahoo.com/>`_
+        Method dowloading stock info from the provider of the stock (`YahooFinance <https://finance.yahoo.com/>`_ by default)
 
         :param start: datetime.datetime object for the beginning of the data acquisition
         :param end: datetime.datetime object for the end of the data aquisition. 
@@ -212,44 +456,34 @@ class Stock:
         
         else:
 
-            if end == None:
-                end = dt.datetime.today()
-
             try:
-                match bool_period:
-                    case True:
-                        stock_data = yf.download(
-                            tickers=[self.ticker],
-                            period=period,
-                            interval=interval,
-                            multi_level_index=False,
-                            auto_adjust=True
-                            )
-                    
-                    case False:
-                        stock_data = yf.download(
-                            tickers=[self.ticker],
-                            start=start,
-                            end=end,
-                            interval=interval,
-                            multi_level_index=False,
-                            auto_adjust=True
-                            )
+                stock_data = self.provider.fetch(self.ticker, start, end, period, interval)
                 self.__stockprint__('DOWNLOAD - Stock downloaded sucessfully')
             except:
-                raise self.__stockprint__('DOWLOAD ERROR')
+                self.__stockprint__('DOWLOAD ERROR')
+                raise
+
+        self.__setdownload__(stock_data)
 
-        self._yfdata:pd.DataFrame = stock_data
+        if datatype in DATATYPE:
+            return self._yfdata[datatype]
+        else:
+            return self._yfdata
+
+    def __setdownload__(self, stock_data: pd.DataFrame):
+        '''
+        Replaces the data of the stock by downloaded data and saves it
+        '''
+
+        self._yfdata:pd.DataFrame = cast_data(stock_data, self.dtypes)
+        self._buffer = None
         self._arbo['loaded'] = True
+        self._arbo['dirty'] = True
+        self._arbo['unreadable'] = None
         self.__setvalues__()
         self.date = self._arbo['date']
 
         self.save_data()
-
-        if datatype in DATATYPE:
-            return stock_data[datatype]
-        else:
-            return stock_data
         
 
         
@@ -281,23 +515,25 @@ class Stock:
         self.figure.plot()
 
     def scrap_financials(self):
-        cfURL = 'https://finance.yahoo.com/quote/{tick}/cash-flow/'.format(tick=self.ticker)
-        bsURL = 'https://finance.yahoo.com/quote/{tick}/balance-sheet/'.format(tick=self.ticker)
-        isURL = 'https://finance.yahoo.com/quote/{tick}/financials/'.format(tick=self.ticker)
-        ticker_info = {}
-        ticker_info['IncomeStatement'] = scrap_url(isURL)
-        ticker_info['BalanceSheet'] = scrap_url(bsURL)
-        ticker_info['CashFlow'] = scrap_url(cfURL)
-        return ticker_info
+        """
+        Financial statements of the stock, from the provider (yfinance scraping by default)
+        """
+        if not self.provider.supports('financials'):
+            raise NotImplementedError(f'{self.provider} does not provide financials')
+        return self.provider.financials(self.ticker)
     
     def save_data(self):
         """
-        Save data to the specified or default arborescence registered during *Stock* construction
+        Save data to the specified or default arborescence registered during *Stock* construction.
+        The JSON snapshot is only rewritten after a download, appended bars are already in the log.
 
         :param path: Path to store data
         """
         try:
-            self._yfdata.to_json(self._arbo['json']['filepath'])
+            if self._arbo['dirty']:
+                self.compact(background=False)
+            else:
+                self._log.sync()
             self._svg.write_image(self._arbo['svg']['filepath'],format='svg')
         except AttributeError:
             self.__stockprint__('SVG not saved because not generated yet.')
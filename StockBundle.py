@@ -1,22 +1,34 @@
 import pandas as pd
 from StockLib.Stock import Stock
 from StockLib.Stock import DATATYPE
+from StockLib.utils import dtype_policy
+import StockLib.Rolling as rol
+from StockLib.Correlation import CorrelationEngine
+from StockLib.Screen import Screen
+from StockLib.Providers import DataProvider, YFinanceProvider
+from StockLib.SharedBundle import BundleServer
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 import datetime as dt
 import numpy as np
+import copy
 
 class Bundle:
 
-    def __init__(self, tickers: list[str]):
+    def __init__(self, tickers: list[str], provider: DataProvider = None, dtype = 'float64'):
         """
         Constructor for stocks bundle class
 
         :param tickers: list of strings storing the tickers of the stocks stored in the bundle
+        :param provider: Data source shared by the stocks (*Providers.DataProvider*), yfinance if ommited
+        :param dtype: Dtype policy of the stocks ('float64', 'float32', 'compact', see *utils.DTYPES*)
         """
 
         self.l_tickers: list[str] = tickers
+        self.provider: DataProvider = provider if provider != None else YFinanceProvider()
+        self.dtypes: dict = dtype_policy(dtype)
         self.stocks: dict = {}
+        self.corr_engine: CorrelationEngine = None
 
         self.close = pd.DataFrame()
         self.open = pd.DataFrame()
@@ -25,7 +37,7 @@ class Bundle:
         self.volume = pd.DataFrame()
 
         for ticker in tickers:
-            self.stocks[ticker] = Stock(ticker,load_local={'bool':True})
+            self.stocks[ticker] = Stock(ticker,local_data={'bool':True},provider=self.provider,dtype=self.dtypes)
         self.__setattrvalues__()
 
     def __getitem__(self, key:list[str]):
@@ -47,7 +59,7 @@ class Bundle:
                  overwrite: bool = False,
                  ):
         """
-        Method dowloading stocks info via `YahooFinance <https://finance.yahoo.com/>`_
+        Method dowloading stocks info from the provider of the bundle, in a single request if it is 'bulk' capable
 
         :param start: datetime.datetime object for the beginning of the data acquisition
         :param end: datetime.datetime object for the end of the data aquisition. 
@@ -57,17 +69,178 @@ class Bundle:
         :return: Dictionnary compiling yfinance data"
         """
 
-        for stock in self.stocks.values():
-            stock.download(start,end,period,interval,overwrite=overwrite)
+        if not self.provider.supports('bulk'):
+            for stock in self.stocks.values():
+                stock.download(start,end,period,interval,overwrite=overwrite)
             self.__setattrvalues__()
+            return
+
+        bool_period = (end == None and start == None and period != '')
+        bool_start_end = (start != None and period == '')
+        if bool_period == bool_start_end:
+            raise ValueError('Enter either a period or a start/end couple')
+
+        tickers = [ticker for ticker, stock in self.stocks.items() if overwrite or stock._yfdata.empty]
+        if len(tickers) > 0:
+            frames = self.provider.fetch_bulk(tickers, start, end, period, interval)
+            for ticker in tickers:
+                self.stocks[ticker].__setdownload__(frames[ticker])
+        self.__setattrvalues__()
 
     def __setattrvalues__(self):
-        for stock in self.stocks.values():
-            self.close[stock.ticker] = stock.close
-            self.open[stock.ticker] = stock.open
-            self.high[stock.ticker] = stock.high
-            self.low[stock.ticker] = stock.low
-            self.volume[stock.ticker] = stock.volume
+        stocks = [stock for stock in self.stocks.values() if stock._arbo['loaded']]
+        for dtype in DATATYPE:
+            setattr(self, dtype.lower(), pd.DataFrame({stock.ticker: getattr(stock, dtype.lower()) for stock in stocks}))
+
+    def __getattr__(self, name: str):
+        # Wide frames dropped by append_bars are rebuilt on their next access
+        if name in [dtype.lower() for dtype in DATATYPE] and 'stocks' in self.__dict__:
+            self.__setattrvalues__()
+            return self.__dict__[name]
+        raise AttributeError(f"'Bundle' object has no attribute '{name}'")
+
+    def append_bars(self, bars: dict, index = None, persist: bool = True):
+        """
+        Appends a new bar to the stocks of the bundle (see *Stock.append_bars*) and updates the correlation engine
+
+        :param bars: Dictionnary ticker -> bar dictionnary
+        :param index: Timestamp of the bars, now if ommited
+        :param persist: Appends the bars to the logs of the stocks
+        :raises: The first exception raised by a stock (e.g. by an alert callback), once every stock got its bar
+        """
+
+        if index == None:
+            index = dt.datetime.now()
+
+        returns = {}
+        error = None
+        for ticker, bar in bars.items():
+            stock = self.stocks[ticker]
+            last = stock._buffer.last()['Close'] if stock._buffer != None else (stock._yfdata['Close'].iloc[-1] if not stock._yfdata.empty else np.nan)
+            size = len(stock._buffer) if stock._buffer != None else len(stock._yfdata)
+            try:
+                stock.append_bars(bar, index, persist)
+            except Exception as e:
+                # Les autres actions reçoivent quand même la barre, l'erreur est relancée à la fin
+                if error == None:
+                    error = e
+            if stock._buffer != None and len(stock._buffer) > size:
+                returns[ticker] = bar['Close'] / last - 1
+
+        for dtype in DATATYPE:
+            self.__dict__.pop(dtype.lower(), None)
+        if self.corr_engine != None:
+            self.corr_engine.update({ticker: r for ticker, r in returns.items() if ticker in self.corr_engine._pos})
+        if error != None:
+            raise error
+
+    def correlation(self, window: int = 60, halflife: float = None, dtype = np.float64, dense: bool = None):
+        """
+        Creates the correlation engine of the bundle from the loaded closes. It is then updated by *append_bars*.
+
+        :param window: Number of bars kept (rolling window, or truncation of the exponential weights)
+        :param halflife: Half-life (bars) of the exponential weights, equal weights if ommited
+        :param dtype: float64 or float32
+        :param dense: Maintains the full covariance matrix incrementally (default for less than 1000 tickers)
+        :return: *Correlation.CorrelationEngine*
+        """
+
+        returns = self.close.astype(np.float64, copy=False).pct_change().iloc[1:]
+        self.corr_engine = CorrelationEngine(list(returns.columns), window, halflife, dtype, dense)
+        self.corr_engine.extend(returns)
+        return self.corr_engine
+
+    def topk_correlated(self, ticker: str, k: int = 10):
+        """
+        Stocks of the bundle most correlated with a stock (uses the correlation engine, created with default settings if needed)
+
+        :param ticker: Reference ticker
+        :param k: Number of tickers returned
+        :return: Serie ticker -> correlation
+        """
+
+        if self.corr_engine == None:
+            self.correlation()
+        return self.corr_engine.topk(ticker, k)
+
+    def rolling_corr(self, ticker: str, n: int = 20, others: list[str] = None):
+        """
+        Rolling correlation of the returns of a stock with the other stocks of the bundle
+
+        :param ticker: Reference ticker
+        :param n: Period
+        :param others: Tickers compared, every ticker of the bundle if ommited
+        :return: Dataframe (time x ticker)
+        """
+
+        returns = self.close.astype(np.float64, copy=False).pct_change()
+        if others == None:
+            others = list(returns.columns)
+        return rol.rolling_corr(returns[others], returns[ticker], n).astype(self.dtypes['indicators'], copy=False)
+
+    def rolling_cov(self, ticker: str, n: int = 20, others: list[str] = None):
+        """
+        Rolling covariance of the returns of a stock with the other stocks of the bundle
+
+        :param ticker: Reference ticker
+        :param n: Period
+        :param others: Tickers compared, every ticker of the bundle if ommited
+        :return: Dataframe (time x ticker)
+        """
+
+        returns = self.close.astype(np.float64, copy=False).pct_change()
+        if others == None:
+            others = list(returns.columns)
+        return rol.rolling_cov(returns[others], returns[ticker], n).astype(self.dtypes['indicators'], copy=False)
+
+    def screen(self, expr: str, tol: float = 1e-6):
+        """
+        Stocks of the bundle matching a screening expression, e.g. ``RSI(14) < 30 and ADX(14) > 25 and close > BB_UPPER(20, 2)``.
+        Only the tail of history needed by the indicators of the expression is computed.
+
+        :param expr: Screening expression (see *Screen.Screen*)
+        :param tol: Tolerance of the EWM based indicators computed on the tail only
+        :return: Dataframe of the last value of every term, for the matching tickers
+        """
+
+        res = Screen(expr, tol).evaluate({dtype.lower(): getattr(self, dtype.lower()) for dtype in DATATYPE})
+        return res[res['match']].drop(columns='match')
+
+    def share(self, name: str = 'stocklib'):
+        """
+        Publishes the data of the bundle in shared memory for the other processes of the host.
+        They read it with *SharedBundle.BundleClient(name)* instead of loading their own *Bundle*.
+
+        :param name: Name of the shared data
+        :return: *SharedBundle.BundleServer*, call its *publish* (or *append_bars* / *download*) to refresh the clients
+        """
+
+        return BundleServer(self, name)
+
+    def process_chunks(self,
+                       indicators: list,
+                       path: str = None,
+                       start: dt.datetime = None,
+                       end: dt.datetime = None,
+                       chunksize: int = 1_000_000,
+                       format: str = 'csv',
+                       ohlcv: bool = False):
+        """
+        Out-of-core computation of streaming indicators for every stock of the bundle (see *Stock.process_chunks*).
+        The stocks are processed one after the other, each with its own copy of the indicators.
+
+        :param indicators: *Streaming.StreamingIndicator* objects used as templates
+        :param path: Output directory (one file per ticker), data directory of every stock if ommited
+        :return: Dictionnary ticker -> path of the output file
+        """
+
+        files = {}
+        for ticker, stock in self.stocks.items():
+            filepath = None
+            if path != None:
+                filepath = path + '/{}.{}'.format(str.replace(ticker, '.', '-'), format)
+            files[ticker] = stock.process_chunks(copy.deepcopy(indicators), filepath, start, end, chunksize, format, ohlcv)
+        return files
 
     def plotcandle(self):
         """
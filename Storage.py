@@ -0,0 +1,212 @@
+import pandas as pd
+import threading
+import time
+import json
+import os
+import re
+from StockLib.utils import DATATYPE
+
+def _fsync_dir(path: str):
+    '''
+    Private fsync of a directory, making the renames and removals of its entries durable (no-op where unsupported, e.g. Windows)
+    '''
+
+    try:
+        fd = os.open(path or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_snapshot(df: pd.DataFrame, filepath: str):
+    """
+    Writes the columnar JSON snapshot of a *Stock* atomically: readers see the previous or the new file, never a torn one
+
+    :param df: Dataframe to save (``Stock._yfdata``)
+    :param filepath: Path of the JSON snapshot
+    """
+
+    tmp = filepath + '.tmp'
+    df.to_json(tmp)
+    with open(tmp, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, filepath)
+    # Le renommage doit être durable avant la suppression des segments qu'il couvre
+    _fsync_dir(os.path.dirname(filepath))
+
+
+class SegmentLog():
+    """
+    Append-only log of the bars of a *Stock*, split in numbered segments
+    """
+
+    def __init__(self, path: str, name: str, segment_size: int = 4*2**20, sync_every: int = 256, sync_interval: float = 1.):
+        '''
+        Constructor
+
+        :param path: Directory of the segments
+        :param name: Name of the log, segments are named ``<name>.<seq>.log``
+        :param segment_size: Size (bytes) above which a new segment is started
+        :param sync_every: Number of records written between two fsync
+        :param sync_interval: Time (s) after which pending records are fsynced anyway, by a timer started with the first pending record
+        '''
+
+        self.path: str = path
+        self.name: str = name
+        self.segment_size: int = segment_size
+        self.sync_every: int = sync_every
+        self.sync_interval: float = sync_interval
+
+        self._lock = threading.Lock()
+        self._compaction: threading.Thread = None
+        self._pending: int = 0
+        self._last_sync: float = time.monotonic()
+        self._timer: threading.Timer = None
+
+        # Never append behind a record possibly torn by a previous crash
+        segments = self.segments()
+        self._seq: int = self.__seq__(segments[-1]) + 1 if len(segments) > 0 else 0
+        self.nbytes: int = sum(os.path.getsize(seg) for seg in segments)
+
+    def __segpath__(self, seq: int):
+        return self.path + '/{}.{:06d}.log'.format(self.name, seq)
+
+    def __seq__(self, segpath: str):
+        return int(segpath.rsplit('.', 2)[-2])
+
+    def segments(self):
+        '''
+        Paths of the segments, oldest first
+        '''
+
+        pattern = re.compile(re.escape(self.name) + r'\.\d{6}\.log$')
+        try:
+            files = [f for f in os.listdir(self.path) if pattern.match(f)]
+        except FileNotFoundError:
+            return []
+        return [self.path + '/' + f for f in sorted(files)]
+
+    def append(self, rows):
+        '''
+        Appends bars to the current segment. Records are fsynced by batches of ``sync_every``, or at most ``sync_interval`` seconds
+        after they were written.
+
+        :param rows: Iterable of (timestamp, bar dictionnary), timestamps are logged in UTC
+        '''
+
+        lines = ''
+        count = 0
+        for t, bar in rows:
+            t = pd.Timestamp(t)
+            # Un offset par ligne ne survit pas à un changement d'heure : tout est écrit en UTC
+            line = {'t': (t.tz_convert('UTC') if t.tz != None else t).isoformat()}
+            line.update((col, float(bar.get(col, 'nan'))) for col in DATATYPE)
+            lines += json.dumps(line) + '\n'
+            count += 1
+
+        with self._lock:
+            with open(self.__segpath__(self._seq), 'a') as f:
+                f.write(lines)
+                self._pending += count
+                roll = f.tell() >= self.segment_size
+                if roll or self._pending >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                    self.__fsync__(f)
+            self.nbytes += len(lines)
+            if roll:
+                self._seq += 1
+            # Dernier lot sans append suivant : fsync différé
+            if self._pending > 0 and self._timer == None:
+                self._timer = threading.Timer(self.sync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def __fsync__(self, f):
+        f.flush()
+        os.fsync(f.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        '''
+        Forces the pending records to disk
+        '''
+
+        with self._lock:
+            if self._timer != None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending > 0:
+                with open(self.__segpath__(self._seq), 'a') as f:
+                    self.__fsync__(f)
+
+    def read(self, segments: list[str] = None, tz = 'UTC'):
+        '''
+        Reads the records of the log. A torn last record (crash while writing) is ignored.
+
+        :param segments: Segments to read, all if ommited
+        :param tz: Timezone of the returned index, None for naive UTC timestamps
+        :returns: OHLCV dataframe
+        '''
+
+        if segments == None:
+            segments = self.segments()
+
+        records = []
+        for seg in segments:
+            with open(seg) as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+
+        if len(records) == 0:
+            return pd.DataFrame(columns=DATATYPE)
+        bars = pd.DataFrame(records)
+        # Naive records are UTC, older records may carry local offsets
+        index = pd.DatetimeIndex(pd.to_datetime(bars.pop('t'), format='ISO8601', utc=True))
+        bars.index = index.tz_localize(None) if tz == None else index.tz_convert(tz)
+        return bars
+
+    def compact(self, df: pd.DataFrame, filepath: str, background: bool = True):
+        '''
+        Writes ``df`` as the new snapshot and deletes the segments it covers. New records go to a fresh segment meanwhile.
+
+        :param df: Dataframe holding every record logged so far
+        :param filepath: Path of the JSON snapshot
+        :param background: Runs the snapshot writing in a thread
+        :returns: Compaction thread, None if run in the foreground or skipped
+        '''
+
+        if self._compaction != None and self._compaction.is_alive():
+            if background:
+                return None
+            self._compaction.join()
+
+        with self._lock:
+            if self._pending > 0:
+                with open(self.__segpath__(self._seq), 'a') as f:
+                    self.__fsync__(f)
+            compacted = [seg for seg in self.segments() if self.__seq__(seg) <= self._seq]
+            self._seq += 1
+
+        def job():
+            write_snapshot(df, filepath)
+            with self._lock:
+                for seg in compacted:
+                    self.nbytes -= os.path.getsize(seg)
+                    os.remove(seg)
+            _fsync_dir(self.path)
+
+        if not background:
+            job()
+            return None
+        self._compaction = threading.Thread(target=job, name=f'compaction-{self.name}')
+        self._compaction.start()
+        return self._compaction
@@ -0,0 +1,615 @@
+import numpy as np
+import pandas as pd
+import datetime as dt
+from StockLib.utils import DATATYPE, fill_integers
+import StockLib.Indicators as ind
+import StockLib.Rolling as rol
+
+class BarBuffer():
+    """
+    Growable preallocated OHLCV buffer backing streamed *Stock* data
+    """
+
+    def __init__(self, columns:list[str] = DATATYPE, capacity:int = 1024, dtypes:dict = None, tz = None, name:str = None):
+        '''
+        Constructor
+
+        :param columns: Columns stored in the buffer
+        :param capacity: Number of bars preallocated
+        :param dtypes: dtype per column, float64 if ommited
+        :param tz: Timezone of the index
+        :param name: Name of the index
+        '''
+
+        if dtypes == None:
+            dtypes = {}
+
+        self.columns:list[str] = list(columns)
+        self.size:int = 0
+        self.tz = tz
+        self.name = name
+        self._index = np.empty(capacity, dtype='datetime64[ns]')
+        self._data:dict = {
+            col: np.empty(capacity, dtype=dtypes.get(col, np.float64)) for col in self.columns
+        }
+
+    @classmethod
+    def from_frame(cls, df:pd.DataFrame, capacity:int = 1024):
+        '''
+        Creates a buffer holding a copy of an existing OHLCV dataframe
+
+        :param df: Dataframe to copy (``Stock._yfdata``)
+        :param capacity: Minimal number of bars preallocated
+        :returns: *BarBuffer*
+        '''
+
+        columns = [col for col in DATATYPE if col in df.columns]
+        index = pd.DatetimeIndex(df.index)
+        buffer = cls(
+            columns,
+            capacity=max(capacity, 2*len(df)),
+            dtypes={col: df[col].dtype for col in columns},
+            tz=index.tz,
+            name=df.index.name
+            )
+        buffer.append(index, {col: df[col].to_numpy() for col in columns})
+        return buffer
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self._index)
+
+    def __grow__(self, needed:int):
+        '''
+        Doubles the capacity until ``needed`` bars fit
+        '''
+
+        capacity = max(self.capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+
+        index = np.empty(capacity, dtype=self._index.dtype)
+        index[:self.size] = self._index[:self.size]
+        self._index = index
+        for col, arr in self._data.items():
+            new = np.empty(capacity, dtype=arr.dtype)
+            new[:self.size] = arr[:self.size]
+            self._data[col] = new
+
+    def append(self, index, values:dict):
+        '''
+        Appends bars at the end of the buffer
+
+        :param index: Timestamps of the bars (DatetimeIndex, list or single timestamp)
+        :param values: Dictionnary column -> scalar or array
+        '''
+
+        if not isinstance(index, pd.Timestamp):
+            index = pd.DatetimeIndex(np.atleast_1d(index))
+        if index.tz != None:
+            if self.tz == None and self.size == 0:
+                self.tz = index.tz
+            index = index.tz_convert('UTC').tz_localize(None)
+        stamps = np.atleast_1d(index.to_numpy(dtype='datetime64[ns]') if isinstance(index, pd.DatetimeIndex) else index.to_datetime64())
+        n = len(stamps)
+
+        if n == 0:
+            return
+        if self.size > 0 and stamps[0] < self._index[self.size-1]:
+            raise ValueError('Bars must be appended in chronological order')
+        if self.size + n > self.capacity:
+            self.__grow__(self.size + n)
+
+        self._index[self.size:self.size+n] = stamps
+        for col, arr in self._data.items():
+            # Même règle que cast_data : volume manquant = 0 dans une colonne entière
+            arr[self.size:self.size+n] = fill_integers(values.get(col, np.nan), arr.dtype)
+        self.size += n
+
+    def last(self):
+        '''
+        Last bar stored, as a dictionnary
+        '''
+
+        if self.size == 0:
+            return None
+        return {col: arr[self.size-1] for col, arr in self._data.items()}
+
+    def frame(self):
+        '''
+        Dataframe view over the filled part of the buffer (no copy)
+        '''
+
+        index = pd.DatetimeIndex(self._index[:self.size], name=self.name)
+        if self.tz != None:
+            index = index.tz_localize('UTC').tz_convert(self.tz)
+        return pd.DataFrame(
+            {col: arr[:self.size] for col, arr in self._data.items()},
+            index=index,
+            copy=False
+            )
+
+
+def _previous(x:np.ndarray, prev:float):
+    '''
+    Private array of the previous values, ``prev`` being the last value of the previous chunk
+    '''
+
+    return np.concatenate([[prev], x[:-1]]) if len(x) > 0 else x
+
+def _true_range(high:np.ndarray, low:np.ndarray, prev_close:np.ndarray):
+    '''
+    Private true range, NaN without previous close (as *Indicators.atr*)
+    '''
+
+    return np.maximum(np.maximum(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+
+class _Ewm():
+    """
+    Private incremental exponential weighted mean, bar for bar identical to ``pd.Series.ewm(...).mean()``
+    """
+
+    def __init__(self, alpha:float, min_periods:int = 0, adjust:bool = True):
+
+        self.alpha = alpha
+        self.min_periods = max(min_periods, 1)
+        self.adjust = adjust
+        self.weighted = np.nan
+        self.old_wt = 1.
+        self.nobs = 0
+
+    def update(self, x:float):
+
+        obs = x == x
+        self.nobs += obs
+
+        if self.weighted == self.weighted:
+            self.old_wt *= 1 - self.alpha
+            if obs:
+                new_wt = 1. if self.adjust else self.alpha
+                if self.weighted != x:
+                    self.weighted = (self.old_wt*self.weighted + new_wt*x) / (self.old_wt + new_wt)
+                if self.adjust:
+                    self.old_wt += new_wt
+                else:
+                    self.old_wt = 1.
+        elif obs:
+            self.weighted = x
+
+        return self.weighted if self.nobs >= self.min_periods else np.nan
+
+    def update_chunk(self, x:np.ndarray):
+        '''
+        ``update`` over an array of observations at once, with the same state afterwards.
+        With ``adjust``, the mean is the ratio of two decayed sums (values and weights) computed by *Rolling.decay_filter*:
+        ``weighted`` is their ratio and ``old_wt`` the weight sum.
+        '''
+
+        x = np.asarray(x, dtype=float)
+        if not self.adjust:
+            return np.array([self.update(value) for value in x])
+        if len(x) == 0:
+            return x.copy()
+
+        obs = x == x
+        started = self.weighted == self.weighted
+        W = rol.decay_filter(obs.astype(float), 1 - self.alpha, self.old_wt if started else 0.)
+        S = rol.decay_filter(np.where(obs, x, 0.), 1 - self.alpha, self.weighted*self.old_wt if started else 0.)
+        nobs = self.nobs + np.cumsum(obs)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = S / W
+        if W[-1] > 0:
+            self.weighted = mean[-1]
+            self.old_wt = W[-1]
+        self.nobs = int(nobs[-1])
+        return np.where(nobs >= self.min_periods, mean, np.nan)
+
+
+class StreamingIndicator():
+    """
+    Base class of the indicators updated bar by bar by *Stock.append_bars*
+    """
+
+    def __init__(self):
+
+        self.name = ''
+        self.value = np.nan
+        self.count = 0
+
+    def update(self, bar:dict):
+        '''
+        Updates the indicator with a new bar
+
+        :param bar: Dictionnary with the OHLCV keys of the new bar
+        :returns: Last value of the indicator
+        '''
+
+        self.count += 1
+        self.value = self.__step__(bar)
+        return self.value
+
+    def update_many(self, df:pd.DataFrame):
+        '''
+        Feeds an OHLCV dataframe (used to warm the indicator up on the history)
+
+        :param df: OHLCV dataframe
+        :returns: Last value of the indicator
+        '''
+
+        self.update_chunk(df)
+        return self.value
+
+    def update_chunk(self, df:pd.DataFrame):
+        '''
+        Updates the indicator with a chunk of bars at once. The state is carried to the next chunk (or bar):
+        chunk after chunk, the values are the ones of the indicator computed on the whole history.
+
+        :param df: OHLCV dataframe
+        :returns: Dataframe of the values of the indicator, indexed as the chunk
+        '''
+
+        data = {col: df[col].to_numpy(dtype=float) for col in DATATYPE if col in df.columns}
+        values = self.__chunk__(data, len(df))
+        self.count += len(df)
+
+        if len(df) > 0:
+            last = {key: arr[-1] for key, arr in values.items()}
+            self.value = last[self.name] if list(last.keys()) == [self.name] else last
+        return pd.DataFrame(values, index=df.index)
+
+    def __chunk__(self, data:dict, size:int):
+        '''
+        Values of a chunk (dictionnary column -> array), bar by bar unless overriden by a vectorized version
+
+        :returns: Dictionnary key -> array
+        '''
+
+        values = {}
+        for i in range(size):
+            value = self.__step__({col: arr[i] for col, arr in data.items()})
+            if not isinstance(value, dict):
+                value = {self.name: value}
+            for key, v in value.items():
+                values.setdefault(key, np.empty(size))[i] = v
+        return values
+
+    def __step__(self, bar:dict):
+        raise NotImplementedError
+
+
+class StreamingEMA(StreamingIndicator):
+
+    def __init__(self, n:int = 14, column:str = 'Close'):
+        '''
+        Exponential Moving Average (span ``n``)
+
+        :param n: Period
+        :param column: OHLCV column the average is applied to
+        '''
+
+        super().__init__()
+        self.name = f'EMA{n}'
+        self.column = column
+        self._ewm = _Ewm(2/(n+1), n)
+
+    def __step__(self, bar:dict):
+        return self._ewm.update(bar[self.column])
+
+    def __chunk__(self, data:dict, size:int):
+        return {self.name: self._ewm.update_chunk(data[self.column])}
+
+
+class StreamingMACD(StreamingIndicator):
+
+    def __init__(self, a:int = 12, b:int = 26, c:int = 9):
+        '''
+        Mean Averaged Convergence Divergence, same values as *Indicators.MACD*
+
+        :param a: EMA Slow
+        :param b: EMA Fast
+        :param c: Signal
+        '''
+
+        super().__init__()
+        self.name = 'MACD'
+        self._fast = _Ewm(2/(a+1), a)
+        self._slow = _Ewm(2/(b+1), b)
+        self._signal = _Ewm(2/(c+1), c)
+
+    def __step__(self, bar:dict):
+        macd = self._fast.update(bar['Close']) - self._slow.update(bar['Close'])
+        signal = self._signal.update(macd)
+        return {'MACD': macd, 'sig': signal, 'deltaMACD': signal - macd}
+
+    def __chunk__(self, data:dict, size:int):
+        macd = self._fast.update_chunk(data['Close']) - self._slow.update_chunk(data['Close'])
+        signal = self._signal.update_chunk(macd)
+        return {'MACD': macd, 'sig': signal, 'deltaMACD': signal - macd}
+
+
+class StreamingRSI(StreamingIndicator):
+
+    def __init__(self, n:int = 14):
+        '''
+        Relative Strength Index, same values as *Indicators.RSI*
+
+        :param n: Period
+        '''
+
+        super().__init__()
+        self.name = 'RSI'
+        self._prev = np.nan
+        self._gain = _Ewm(1/n, n)
+        self._loss = _Ewm(1/n, n)
+
+    def __step__(self, bar:dict):
+        delta = bar['Close'] - self._prev
+        self._prev = bar['Close']
+        gain = self._gain.update(delta if delta > 0 else 0.)
+        loss = self._loss.update(-delta if delta < 0 else 0.)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            RS = np.float64(gain) / np.float64(loss)
+            return float(100 - (100 / (1 + RS)))
+
+    def __chunk__(self, data:dict, size:int):
+        close = data['Close']
+        delta = close - _previous(close, self._prev)
+        if size > 0:
+            self._prev = close[-1]
+        gain = self._gain.update_chunk(np.where(delta > 0, delta, 0.))
+        loss = self._loss.update_chunk(np.where(delta < 0, -delta, 0.))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {self.name: 100 - (100 / (1 + gain / loss))}
+
+
+class StreamingATR(StreamingIndicator):
+
+    def __init__(self, n:int = 14):
+        '''
+        Average True Rate, same values as *Indicators.ATR*
+
+        :param n: Period
+        '''
+
+        super().__init__()
+        self.name = 'ATR'
+        self._prev = np.nan
+        self._atr = _Ewm(1/n, n)
+
+    def __step__(self, bar:dict):
+        H, L = bar['High'], bar['Low']
+        TR = max(H - L, abs(H - self._prev), abs(L - self._prev))
+        if self._prev != self._prev:
+            TR = np.nan
+        self._prev = bar['Close']
+        return self._atr.update(TR)
+
+    def __chunk__(self, data:dict, size:int):
+        TR = _true_range(data['High'], data['Low'], _previous(data['Close'], self._prev))
+        if size > 0:
+            self._prev = data['Close'][-1]
+        return {self.name: self._atr.update_chunk(TR)}
+
+
+class StreamingADX(StreamingIndicator):
+
+    def __init__(self, n:int = 14):
+        '''
+        Average Directional Index, same values as *Indicators.ADX*
+
+        :param n: Period
+        '''
+
+        super().__init__()
+        self.name = 'ADX'
+        self._prev = {'High': np.nan, 'Low': np.nan, 'Close': np.nan}
+        self._atr = _Ewm(1/n, n)
+        self._pdm = _Ewm(1/(1+n), n)
+        self._ndm = _Ewm(1/(1+n), n)
+        self._dx = _Ewm(1/n, n)
+
+    def __step__(self, bar:dict):
+        return float(self.__chunk__({col: np.array([bar[col]], dtype=float) for col in ['High', 'Low', 'Close']}, 1)[self.name][0])
+
+    def __chunk__(self, data:dict, size:int):
+        high, low, close = data['High'], data['Low'], data['Close']
+        prev_high = _previous(high, self._prev['High'])
+        prev_low = _previous(low, self._prev['Low'])
+        TR = _true_range(high, low, _previous(close, self._prev['Close']))
+        if size > 0:
+            self._prev = {'High': high[-1], 'Low': low[-1], 'Close': close[-1]}
+
+        # Même ordre que Indicators.adx : NDM comparé au PDM déjà filtré
+        PDM = high - prev_high
+        NDM = prev_low - low
+        with np.errstate(invalid='ignore'):
+            PDM = np.where((PDM > 0) & (PDM > NDM), PDM, 0.)
+            NDM = np.where((NDM > 0) & (NDM > PDM), NDM, 0.)
+
+        ATR = self._atr.update_chunk(TR)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            PDI = self._pdm.update_chunk(PDM) / ATR * 100
+            NDI = self._ndm.update_chunk(NDM) / ATR * 100
+            DX = np.abs(PDI - NDI) / (PDI + NDI) * 100
+        return {self.name: self._dx.update_chunk(DX)}
+
+
+class _WindowIndicator(StreamingIndicator):
+    """
+    Private base of the rolling window indicators: the last bars of a chunk are kept to compute the windows of the next one
+    """
+
+    def __init__(self, warmup:int, columns:list[str]):
+
+        super().__init__()
+        self.warmup = warmup
+        self._tail:dict = {col: np.empty(0) for col in columns}
+
+    def __step__(self, bar:dict):
+        values = self.__chunk__({col: np.array([bar[col]], dtype=float) for col in self._tail}, 1)
+        if len(values) == 1:
+            return float(next(iter(values.values()))[0])
+        return {key: float(arr[0]) for key, arr in values.items()}
+
+    def __chunk__(self, data:dict, size:int):
+        window = {col: np.concatenate([tail, data[col]]) for col, tail in self._tail.items()}
+        start = len(window[next(iter(self._tail))]) - size
+        self._tail = {col: arr[len(arr) - min(self.warmup, len(arr)):] for col, arr in window.items()}
+        return {key: arr[start:] for key, arr in self.__compute__(window).items()}
+
+    def __compute__(self, window:dict):
+        raise NotImplementedError
+
+
+class StreamingBollingerBands(_WindowIndicator):
+
+    def __init__(self, n:int = 20, k:float = 2):
+        '''
+        Bollinger Bands, same values as *Indicators.BollingerBands*
+
+        :param n: Period
+        :param k: Multiplier
+        '''
+
+        super().__init__(ind.BollingerBands.warmup(n, k), ['Close'])
+        self.name = 'BollingerBands'
+        self.n, self.k = n, k
+
+    def __compute__(self, window:dict):
+        upper_band, lower_band, rolling_mean = ind.bollinger(window['Close'], self.n, self.k)
+        return {'Upper band': upper_band, 'Lower band': lower_band, 'Rolling mean': rolling_mean, 'Delta': upper_band - lower_band}
+
+
+class StreamingDonchianChannels(_WindowIndicator):
+
+    def __init__(self, n:int = 20):
+        '''
+        Donchian Channels, same values as *Indicators.DonchianChannels*
+
+        :param n: Period
+        '''
+
+        super().__init__(ind.DonchianChannels.warmup(n), ['High', 'Low'])
+        self.name = 'DonchianChannels'
+        self.n = n
+
+    def __compute__(self, window:dict):
+        upper_band = rol.rolling_max(window['High'], self.n)
+        lower_band = rol.rolling_min(window['Low'], self.n)
+        return {'Upper band': upper_band, 'Lower band': lower_band, 'Middle': (upper_band + lower_band) / 2}
+
+
+class StreamingStochastic(_WindowIndicator):
+
+    def __init__(self, n:int = 14, d:int = 3):
+        '''
+        Stochastic Oscillator, same values as *Indicators.Stochastic*
+
+        :param n: Period of %K
+        :param d: Period of %D
+        '''
+
+        super().__init__(ind.Stochastic.warmup(n, d), ['High', 'Low', 'Close'])
+        self.name = 'Stochastic'
+        self.n, self.d = n, d
+
+    def __compute__(self, window:dict):
+        highest = rol.rolling_max(window['High'], self.n)
+        lowest = rol.rolling_min(window['Low'], self.n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            K = 100 * (window['Close'] - lowest) / (highest - lowest)
+        return {'K': K, 'D': rol.rolling_mean_std(K, self.d)[0]}
+
+
+class FakeFeed():
+    """
+    Random walk bar generator, stands for a live feed to test the streaming locally
+    """
+
+    def __init__(self, tickers:list[str], seed:int = 0, start:dt.datetime = None, freq:str = '1s', price:float = 100.):
+        '''
+        Constructor
+
+        :param tickers: Tickers fed
+        :param seed: Seed of the random generator
+        :param start: Timestamp of the first bar, now if ommited
+        :param freq: Time between two bars
+        :param price: Starting price of every ticker
+        '''
+
+        if start == None:
+            start = dt.datetime.now().replace(microsecond=0)
+
+        self.tickers:list[str] = list(tickers)
+        self.time = pd.Timestamp(start)
+        self.step = pd.Timedelta(freq)
+        self._rng = np.random.default_rng(seed)
+        self._close = np.full(len(self.tickers), price)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        '''
+        Next bar of every ticker
+
+        :returns: (timestamp, {ticker: bar})
+        '''
+
+        n = len(self.tickers)
+        opn = self._close
+        close = opn * np.exp(self._rng.normal(0, 1e-3, n))
+        spread = np.abs(self._rng.normal(0, 5e-4, n)) * opn
+        high = np.maximum(opn, close) + spread
+        low = np.minimum(opn, close) - spread
+        volume = self._rng.integers(100, 10000, n)
+        self._close = close
+
+        bars = {
+            ticker: {'Open':opn[i], 'High':high[i], 'Low':low[i], 'Close':close[i], 'Volume':volume[i]}
+            for i, ticker in enumerate(self.tickers)
+        }
+        time = self.time
+        self.time += self.step
+        return time, bars
+
+
+def run_fake_feed(stocks:dict, nbars:int = 60, seed:int = 0, persist:bool = True):
+    '''
+    Feeds *Stock* objects with a *FakeFeed*, one bar per ticker per step
+
+    :param stocks: Dictionnary ticker -> *Stock*
+    :param nbars: Number of bars sent to every stock
+    :param seed: Seed of the feed
+    :param persist: Append the bars to the stocks logs
+    :returns: Mean time (s) to ingest one step of the whole universe
+    '''
+
+    feed = FakeFeed(list(stocks.keys()), seed=seed)
+    elapsed = 0.
+    for _ in range(nbars):
+        time, bars = next(feed)
+        t0 = dt.datetime.now()
+        for ticker, bar in bars.items():
+            stocks[ticker].append_bars(bar, time, persist=persist)
+        elapsed += (dt.datetime.now() - t0).total_seconds()
+    return elapsed / max(nbars, 1)
+
+
+if __name__ == '__main__':
+
+    import sys
+    import tempfile
+    from StockLib.Stock import Stock
+
+    nstocks = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    path = tempfile.mkdtemp()
+    stocks = {f'FAKE{i}': Stock(f'FAKE{i}', local_data={'path': path}) for i in range(nstocks)}
+    for stock in stocks.values():
+        stock.add_stream(StreamingRSI(14))
+    print(f'{nstocks} stocks, {run_fake_feed(stocks, 10)*1e3:.1f} ms per step ({path})')
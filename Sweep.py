@@ -0,0 +1,112 @@
+import numpy as np
+import StockLib.Rolling as rol
+
+def ewm_sweep(x, alphas, min_periods):
+    '''
+    Exponential weighted means of a serie for a vector of smoothing factors, same values as ``pd.Series.ewm(alpha=a, min_periods=m).mean()``.
+    The decayed sums of the values and of the weights are computed for all the factors at once (*Rolling.decay_filter*).
+
+    :param x: Input serie
+    :param alphas: Smoothing factors
+    :param min_periods: Minimal number of observations, per smoothing factor
+    :returns: Array (time x parameter)
+    '''
+
+    x = np.asarray(x, dtype=float)
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=float))
+    min_periods = np.maximum(np.broadcast_to(min_periods, alphas.shape), 1)
+
+    obs = x == x
+    mean = rol.decay_filter(np.where(obs, x, 0.), 1 - alphas)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean /= rol.decay_filter(obs.astype(float), 1 - alphas)
+
+    # Nombre d'observations croissant : seul le début de chaque colonne est masqué
+    for p, first in enumerate(np.searchsorted(np.cumsum(obs), min_periods)):
+        mean[:first, p] = np.nan
+    return mean
+
+
+def ema_sweep(close, spans):
+    '''
+    EMA (span ``n``, ``min_periods=n``) of a serie for every span
+
+    :param close: Input serie
+    :param spans: Spans
+    :returns: Array (time x span)
+    '''
+
+    spans = np.asarray(spans)
+    return ewm_sweep(close, 2/(spans+1), spans)
+
+
+def rsi_sweep(close, windows):
+    '''
+    RSI for every window, same values as *Indicators.RSI*. The price difference is computed once for all windows,
+    and the exponential averages of all windows in one pass.
+
+    :param close: Close serie
+    :param windows: RSI periods
+    :returns: Array (time x window)
+    '''
+
+    windows = np.atleast_1d(windows)
+    delta = np.diff(np.asarray(close, dtype=float), prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.)
+    loss = np.where(delta < 0, -delta, 0.)
+
+    # Gains et pertes (NaN remplacés par 0) sont toujours observés : la somme des poids se simplifie dans RS
+    sum_gain = rol.decay_filter(gain, 1 - 1/windows)
+    sum_loss = rol.decay_filter(loss, 1 - 1/windows)
+
+    # 100 - 100/(1 + RS) = 100 * gain / (gain + loss)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sum_loss += sum_gain
+        RSI = np.divide(sum_gain, sum_loss, out=sum_gain)
+    RSI *= 100
+    for p, n in enumerate(windows):
+        RSI[:n-1, p] = np.nan
+    return RSI
+
+
+def atr_sweep(high, low, close, windows):
+    '''
+    ATR for every window, same values as *Indicators.ATR*. The true range is computed once for all windows.
+
+    :param high: High serie
+    :param low: Low serie
+    :param close: Close serie
+    :param windows: ATR periods
+    :returns: Array (time x window)
+    '''
+
+    windows = np.asarray(windows)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    prev = np.concatenate([[np.nan], np.asarray(close, dtype=float)[:-1]])
+    TR = np.maximum(high - low, np.maximum(np.abs(high - prev), np.abs(low - prev)))
+    TR[np.isnan(prev)] = np.nan
+
+    return ewm_sweep(TR, 1/windows, windows)
+
+
+def bollinger_sweep(close, windows, k: float = 2):
+    '''
+    Bollinger Bands for every window, from cumulative sums shared by all windows (*Rolling._rolling_moments*)
+
+    :param close: Close serie
+    :param windows: Rolling periods
+    :param k: Multiplier
+    :returns: Dictionnary of arrays (time x window): 'Upper band', 'Lower band', 'Rolling mean'
+    '''
+
+    moments = rol._rolling_moments(np.asarray(close, dtype=float).reshape(-1, 1), None, np.atleast_1d(windows))
+    mean = moments['mean'][:, :, 0]
+    std = np.sqrt(moments['var'][:, :, 0])
+    std *= k
+
+    return {
+        'Upper band': (mean + std).T,
+        'Lower band': (mean - std).T,
+        'Rolling mean': mean.T
+    }
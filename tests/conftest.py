@@ -0,0 +1,17 @@
+'''
+The repository is the StockLib package itself: it is imported from a temporary directory holding a
+StockLib link to it, which is also the working directory (PlotlyStock reads StockLib/plotlydata.json)
+and holds the default StockData directory.
+'''
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOME = tempfile.mkdtemp(prefix='stocklib-tests-')
+
+os.symlink(ROOT, os.path.join(HOME, 'StockLib'))
+sys.path.insert(0, HOME)
+os.mkdir(os.path.join(HOME, 'StockData'))
+os.chdir(HOME)
@@ -0,0 +1,32 @@
+'''
+Errors of the alert callbacks during *Bundle.append_bars*
+'''
+
+import pandas as pd
+import pytest
+
+from StockLib.StockBundle import Bundle
+from StockLib.Providers import ReplayProvider
+from StockLib.Alerts import AlertEngine, above
+
+def test_bundle_callback_error():
+    bundle = Bundle(['A1', 'B1', 'C1'], provider=ReplayProvider(nbars=200))
+    bundle.download(period='max', interval='1m', overwrite=True)
+    engine = bundle.correlation(window=20)
+    count = engine.count
+    bundle.close
+
+    def fail(event):
+        raise RuntimeError('callback')
+    alerts = AlertEngine()
+    alerts.subscribe(bundle.stocks['A1'], above('Close', 0), fail)
+
+    index = bundle.close.index[-1] + pd.Timedelta('1min')
+    bars = {ticker: {'Open': 1., 'High': 1., 'Low': 1., 'Close': 1., 'Volume': 1} for ticker in bundle.stocks}
+    with pytest.raises(RuntimeError, match='callback'):
+        bundle.append_bars(bars, index)
+
+    for stock in bundle.stocks.values():
+        assert stock._yfdata.index[-1] == index
+    assert (bundle.close.iloc[-1] == 1.).all()
+    assert engine.count == count + 1
@@ -0,0 +1,117 @@
+'''
+float32 and compact policies against float64 over the same bars, with the bounds of the README
+(largest difference relative to the largest float64 value)
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from StockLib.Stock import Stock
+from StockLib.Providers import ReplayProvider
+from StockLib.utils import cast_data, fill_integers
+
+TICKERS = ['T0', 'T1', 'T2', 'T3', 'T17']  # T17 has an ADX direction flip
+NBARS = 20_000
+POLICIES = ['float32', 'compact']
+
+INDICATORS = {
+    'RSI': (lambda s: s.RSI(14)['RSI'], 2e-5),
+    'MACD': (lambda s: s.MACD().get_rawdata()['indicator']['MACD'], 5e-6),
+    'ATR': (lambda s: s.ATR(14)['ATR'], 2e-5),
+    'Bollinger': (lambda s: s.BollingerBands(20, 2)['Upper band'], 2e-7),
+    'RSI_sweep': (lambda s: s.RSI_sweep([5, 14, 50]), 1e-4),
+    'ATR_sweep': (lambda s: s.ATR_sweep([5, 14, 50]), 5e-5),
+    'Bollinger_sweep': (lambda s: s.BollingerBands_sweep([5, 20, 50]), 2e-7),
+}
+
+# ADX compares +DM and -DM: on the rare bars where they differ by less than the float32 rounding of the prices,
+# the direction flips and the ADX moves by a few percent for the length of its smoothing
+ADX_BOUND = 5e-2
+ADX_QUANTILE = (0.99, 5e-5)
+
+def relative_error(value, reference):
+    value = np.asarray(value, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    return np.abs(value - reference) / np.nanmax(np.abs(reference), axis=0)
+
+@pytest.fixture(scope='module')
+def stocks(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('data'))
+    res = {}
+    for policy in ['float64'] + POLICIES:
+        for ticker in TICKERS:
+            stock = Stock(ticker, local_data={'path': path}, provider=ReplayProvider(nbars=NBARS), dtype=policy)
+            stock.download(period='max', interval='1m', overwrite=True)
+            res[policy, ticker] = stock
+    return res
+
+@pytest.mark.parametrize('policy', POLICIES)
+def test_stored_dtypes(stocks, policy):
+    data = stocks[policy, 'T0']._yfdata
+    assert (data[['Open', 'High', 'Low', 'Close']].dtypes == np.float32).all()
+    assert data['Volume'].dtype == (np.uint32 if policy == 'compact' else np.int64)
+
+@pytest.mark.parametrize('policy', POLICIES)
+@pytest.mark.parametrize('name', list(INDICATORS))
+def test_indicators(stocks, policy, name):
+    compute, bound = INDICATORS[name]
+    for ticker in TICKERS:
+        reference = compute(stocks['float64', ticker])
+        value = compute(stocks[policy, ticker])
+        dtypes = value.dtypes.tolist() if isinstance(value, pd.DataFrame) else [value.dtype]
+        assert all(dtype == np.float32 for dtype in dtypes)
+        assert value.shape == reference.shape
+        assert (np.isnan(np.asarray(value, dtype=np.float64)) == np.isnan(np.asarray(reference))).all()
+        assert np.nanmax(relative_error(value, reference)) < bound, ticker
+
+@pytest.mark.parametrize('policy', POLICIES)
+def test_adx(stocks, policy):
+    for ticker in TICKERS:
+        reference = stocks['float64', ticker].ADX()['ADX']
+        value = stocks[policy, ticker].ADX()['ADX']
+        assert value.dtype == np.float32
+        error = relative_error(value, reference)
+        assert np.nanmax(error) < ADX_BOUND, ticker
+        assert np.nanquantile(error, ADX_QUANTILE[0]) < ADX_QUANTILE[1], ticker
+
+def test_cast_data():
+    index = pd.date_range('2024-01-02 09:30', periods=3, freq='min')
+    df = pd.DataFrame({'Open': [1., 2, 3], 'High': [1., 2, 3], 'Low': [1., 2, 3], 'Close': [1., 2, 3], 'Volume': [10, np.nan, 30]}, index=index)
+
+    res = cast_data(df, {'prices': 'float32', 'volume': 'uint32', 'indicators': 'float32'})
+    assert res['Close'].dtype == np.float32
+    assert res['Volume'].dtype == np.uint32
+    assert res['Volume'].tolist() == [10, 0, 30]
+    assert df['Volume'].isna().sum() == 1
+
+    same = cast_data(res, {'prices': 'float32', 'volume': 'uint32', 'indicators': 'float32'})
+    assert same is res
+
+    with pytest.raises(ValueError):
+        cast_data(df.assign(Volume=[10., 2.**32, 30]), {'prices': 'float32', 'volume': 'uint32', 'indicators': 'float32'})
+
+def test_fill_integers():
+    assert fill_integers(np.array([1., np.nan, 3.]), np.uint32).tolist() == [1, 0, 3]
+    assert fill_integers(np.array([np.nan]), np.int64).tolist() == [0]
+    assert fill_integers(np.array([2.**32 - 1]), np.uint32).tolist() == [2**32 - 1]
+
+    values = np.array([1.5, np.nan])
+    assert fill_integers(values, np.float32) is values
+
+    with pytest.raises(ValueError):
+        fill_integers(np.array([2.**32]), np.uint32)
+    with pytest.raises(ValueError):
+        fill_integers(np.array([-1.]), np.uint32)
+
+def test_append_missing_volume(tmp_path):
+    stock = Stock('T0', local_data={'path': str(tmp_path)}, provider=ReplayProvider(nbars=100), dtype='compact')
+    stock.download(period='max', interval='1m', overwrite=True)
+
+    stock.append_bars({'Open': 1., 'High': 1., 'Low': 1., 'Close': 1., 'Volume': np.nan}, index=pd.Timestamp('2030-01-01'))
+    stock.append_bars({'Open': 1., 'High': 1., 'Low': 1., 'Close': 1.}, index=pd.Timestamp('2030-01-02'))
+    assert stock._yfdata['Volume'].dtype == np.uint32
+    assert stock._yfdata['Volume'].iloc[-2:].tolist() == [0, 0]
+
+    with pytest.raises(ValueError):
+        stock.append_bars({'Open': 1., 'High': 1., 'Low': 1., 'Close': 1., 'Volume': 2.**32}, index=pd.Timestamp('2030-01-03'))
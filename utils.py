@@ -3,6 +3,70 @@ import datetime as dt
 import shutil
 from bs4 import BeautifulSoup
 import os
+import numpy as np
+
+DATATYPE = ['Open','High','Low','Close','Volume']
+
+# Politiques de types : prix, volume (None = tel que chargé) et sorties des indicateurs
+DTYPES = {
+    'float64': {'prices': np.float64, 'volume': None, 'indicators': np.float64},
+    'float32': {'prices': np.float32, 'volume': np.int64, 'indicators': np.float32},
+    'compact': {'prices': np.float32, 'volume': np.uint32, 'indicators': np.float32},
+}
+
+def dtype_policy(dtype):
+    """
+    Dtype policy of a *Stock* or a *Bundle*
+
+    :param dtype: Name of a policy of ``DTYPES`` ('float64', 'float32', 'compact') or dictionnary overriding 'float64' (keys prices, volume, indicators)
+    :return: Dictionnary prices / volume / indicators
+    """
+
+    if isinstance(dtype, dict):
+        return {**DTYPES['float64'], **dtype}
+    if dtype not in DTYPES:
+        raise ValueError(f'Unknown dtype policy: {dtype} (accepted: {", ".join(DTYPES)})')
+    return dict(DTYPES[dtype])
+
+def fill_integers(values, dtype):
+    """
+    Prepares values stored as integers: missing values become 0, values out of the range of the dtype raise a ValueError
+
+    :param values: Array, serie or scalar
+    :param dtype: Destination dtype, values returned unchanged if not an integer type
+    :return: Values without NaN
+    """
+
+    if not np.issubdtype(dtype, np.integer):
+        return values
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        values = np.where(values == values, values, 0)
+    info = np.iinfo(dtype)
+    if values.size > 0 and (values.max() > info.max or values.min() < info.min):
+        raise ValueError(f'Volume does not fit in {np.dtype(dtype)}')
+    return values
+
+def cast_data(df, dtypes: dict):
+    """
+    Casts an OHLCV dataframe to a dtype policy. Missing volumes become 0 when the volume is stored as integers.
+
+    :param df: OHLCV dataframe
+    :param dtypes: Dtype policy (see *dtype_policy*)
+    :return: Dataframe, not copied if already compliant
+    """
+
+    columns = {}
+    for col in [col for col in DATATYPE if col in df.columns]:
+        dtype = dtypes['volume'] if col == 'Volume' else dtypes['prices']
+        if dtype != None and df[col].dtype != dtype:
+            columns[col] = dtype
+    if len(columns) == 0:
+        return df
+
+    if 'Volume' in columns:
+        df = df.assign(Volume=fill_integers(df['Volume'].to_numpy(), columns['Volume']))
+    return df.astype(columns)
 
 def scrap_url(URL: str):
     """